@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from cachetools import TTLCache
+
+# Admission control for the expensive intents (image generation, background
+# changes, long research completions). Each intent has a concurrency limit
+# with a short bounded wait queue behind it, and every user draws from a
+# token bucket; requests that would exceed either are rejected straight away
+# (HTTP 429) instead of queueing behind everyone else. Intents without a
+# limit, casual chat in particular, are never held up.
+
+
+def _parse_limits(value: str) -> dict:
+    # "image_generation=8,research_coding=16"
+    limits = {}
+    for item in value.split(","):
+        intent, _, limit = item.partition("=")
+        if intent.strip() and limit.strip():
+            limits[intent.strip()] = int(limit)
+    return limits
+
+
+# --- Configuration ---
+ADMISSION_CONCURRENCY = _parse_limits(os.getenv("ADMISSION_CONCURRENCY", "image_generation=8,image_manipulation=4,research_coding=16"))
+ADMISSION_QUEUE = _parse_limits(os.getenv("ADMISSION_QUEUE", "image_generation=16,image_manipulation=8,research_coding=32"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+# Per-user bucket shared by all limited intents; an intent costs ADMISSION_COSTS tokens (default 1).
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "0.2"))  # tokens per second
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "10"))
+ADMISSION_COSTS = _parse_limits(os.getenv("ADMISSION_COSTS", "image_generation=2,image_manipulation=3,research_coding=1"))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float) -> float:
+        # Returns 0 if the tokens were taken, else seconds until they would be available.
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def refund(self, cost: float):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class IntentLimiter:
+    def __init__(self, intent: str, concurrency: int, queue_limit: int, queue_timeout: float):
+        self.intent = intent
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self._semaphore.locked() and self.waiting >= self.queue_limit:
+            self.rejected += 1
+            raise AdmissionRejected(f"Too many {self.intent} requests in progress, please try again shortly.", 1.0)
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected(f"Too many {self.intent} requests in progress, please try again shortly.", 1.0)
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+
+class AdmissionController:
+    def __init__(self):
+        self.limiters = {
+            intent: IntentLimiter(intent, limit, ADMISSION_QUEUE.get(intent, limit * 2), ADMISSION_QUEUE_TIMEOUT)
+            for intent, limit in ADMISSION_CONCURRENCY.items()
+        }
+        # Idle buckets expire once they would have refilled anyway.
+        ttl = ADMISSION_USER_BURST / ADMISSION_USER_RATE if ADMISSION_USER_RATE > 0 else 3600
+        self._buckets = TTLCache(maxsize=100_000, ttl=ttl)
+        self.throttled = 0
+
+    def is_limited(self, intent: str) -> bool:
+        return intent in self.limiters
+
+    def charge(self, intent: str, user_key: str):
+        # Takes the intent's cost from the user's bucket only, for work whose
+        # concurrency is bounded elsewhere (background jobs). Returns a refund
+        # callable; raises AdmissionRejected.
+        if intent not in self.limiters:
+            return lambda: None
+        cost = ADMISSION_COSTS.get(intent, 1)
+        bucket = self._buckets.get(user_key)
+        if bucket is None:
+            bucket = self._buckets[user_key] = TokenBucket(ADMISSION_USER_RATE, ADMISSION_USER_BURST)
+        wait = bucket.take(cost)
+        if wait:
+            self.throttled += 1
+            raise AdmissionRejected("You are sending expensive requests too quickly, please slow down.", wait)
+        return lambda: bucket.refund(cost)
+
+    async def acquire(self, intent: str, user_key: str):
+        # Returns an idempotent release callable; raises AdmissionRejected.
+        limiter = self.limiters.get(intent)
+        if limiter is None:
+            return lambda: None
+
+        refund = self.charge(intent, user_key)
+        try:
+            await limiter.acquire()
+        except BaseException:
+            refund()
+            raise
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                limiter.release()
+        return release
+
+    @asynccontextmanager
+    async def slot(self, intent: str, user_key: str):
+        release = await self.acquire(intent, user_key)
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> dict:
+        stats = {"throttled": self.throttled, "tracked_users": len(self._buckets)}
+        for intent, limiter in self.limiters.items():
+            stats[f"{intent}_active"] = limiter.active
+            stats[f"{intent}_waiting"] = limiter.waiting
+            stats[f"{intent}_admitted"] = limiter.admitted
+            stats[f"{intent}_rejected"] = limiter.rejected
+        return stats
+
+
+controller = AdmissionController()
+
+
+def client_key(user_id: Optional[int], host: Optional[str]) -> str:
+    # Anonymous users are limited per client address.
+    return f"user:{user_id}" if user_id else f"ip:{host or 'unknown'}"
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+import blob_store
+import database
+
+# NDJSON export and import of a user's conversations. Export walks the
+# conversations and messages tables in keyset batches, each one a short read
+# on a pooled connection, and yields the lines as it goes, so memory stays
+# flat however large the account and no read transaction is held open for
+# the whole download. Import parses the upload line by line and inserts it
+# through the batched writer, IMPORT_BATCH_SIZE records per transaction.
+#
+# Format, one JSON object per line:
+#   {"type": "export", "version": 1, "username": ..., "images": ..., "exported_at": ...}
+#   {"type": "conversation", "id": ..., "title": ..., "updated_at": ...}
+#   {"type": "message", "id": ..., "conversation_id": ..., "role": ..., "content": ...,
+#    "timestamp": ..., "image_blob": <sha256> | "image": <base64>}
+# Messages follow their conversation; messages from before conversations
+# existed come last with "conversation_id": null.
+
+# --- Configuration ---
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(1024 * 1024)))  # flushed to the client at this size
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(32 * 1024 * 1024)))  # a line with an inline image
+
+FORMAT_VERSION = 1
+# none: no images; reference: blob digests (same server); inline: base64 in the line
+IMAGE_MODES = ("none", "reference", "inline")
+
+
+# Fields stored as-is, which must be strings (or null) in an imported line
+TEXT_FIELDS = {
+    "conversation": ("title", "updated_at"),
+    "message": ("role", "content", "timestamp", "image_blob", "image"),
+}
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def _line(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# --- Export ---
+
+async def _message_lines(user_id: int, conversation_id: Optional[int], images: str) -> AsyncIterator[bytes]:
+    after = 0
+    while True:
+        rows = await database.read(
+            lambda conn: conn.execute(
+                "SELECT id, role, content, image_blob, timestamp FROM messages "
+                "WHERE user_id = ? AND conversation_id IS ? AND id > ? ORDER BY id LIMIT ?",
+                (user_id, conversation_id, after, EXPORT_BATCH_SIZE)
+            ).fetchall()
+        )
+        if not rows:
+            return
+        chunk, size = [], 0
+        for r in rows:
+            message = {
+                "type": "message",
+                "id": r["id"],
+                "conversation_id": conversation_id,
+                "role": r["role"],
+                "content": r["content"],
+                "timestamp": r["timestamp"],
+            }
+            if r["image_blob"] and images == "reference":
+                message["image_blob"] = r["image_blob"]
+            elif r["image_blob"] and images == "inline":
+                message["image"] = await asyncio.to_thread(blob_store.get_b64, r["image_blob"])
+            line = _line(message)
+            chunk.append(line)
+            size += len(line)
+            # With inline images one batch can be hundreds of MB; never hold more than a chunk of it.
+            if size >= EXPORT_CHUNK_BYTES:
+                yield b"".join(chunk)
+                chunk, size = [], 0
+        if chunk:
+            yield b"".join(chunk)
+        after = rows[-1]["id"]
+
+
+async def export_ndjson(user: dict, images: str = "reference") -> AsyncIterator[bytes]:
+    yield _line({
+        "type": "export",
+        "version": FORMAT_VERSION,
+        "username": user["username"],
+        "images": images,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+    })
+
+    after = 0
+    while True:
+        conversations = await database.read(
+            lambda conn: conn.execute(
+                "SELECT id, title, updated_at FROM conversations WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (user["id"], after, EXPORT_BATCH_SIZE)
+            ).fetchall()
+        )
+        if not conversations:
+            break
+        for c in conversations:
+            yield _line({"type": "conversation", "id": c["id"], "title": c["title"], "updated_at": c["updated_at"]})
+            async for chunk in _message_lines(user["id"], c["id"], images):
+                yield chunk
+        after = conversations[-1]["id"]
+
+    async for chunk in _message_lines(user["id"], None, images):
+        yield chunk
+
+
+# --- Import ---
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    # Only newly received bytes are scanned, so a long line is not searched
+    # again for every chunk it spans.
+    buffer = bytearray()
+    number = 0
+    async for chunk in chunks:
+        scan = len(buffer)
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", scan)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end])
+            start = scan = end + 1
+            number += 1
+            if line.strip():
+                yield number, line
+        del buffer[:start]
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise ArchiveError(f"Line {number + 1} is longer than {IMPORT_MAX_LINE_BYTES} bytes")
+    if buffer.strip():
+        yield number + 1, bytes(buffer)
+
+
+def _insert_batch(conn, user_id: int, records: list, conversation_ids: dict) -> dict:
+    # Returns the exported -> new conversation ids created by this batch. The
+    # caller only merges them once the batch has committed, so a batch that
+    # rolls back leaves no stale ids behind.
+    created = {}
+    cursor = conn.cursor()
+
+    def conversation_for(exported_id, title=None, updated_at=None):
+        if exported_id is None:
+            return None
+        new_id = created.get(exported_id) or conversation_ids.get(exported_id)
+        if new_id is None:
+            cursor.execute(
+                "INSERT INTO conversations (user_id, title, updated_at) VALUES (?, ?, coalesce(?, CURRENT_TIMESTAMP))",
+                (user_id, title or "Imported conversation", updated_at)
+            )
+            new_id = created[exported_id] = cursor.lastrowid
+        return new_id
+
+    messages = []
+    for record in records:
+        if record["type"] == "conversation":
+            conversation_for(record.get("id"), record.get("title"), record.get("updated_at"))
+        else:
+            messages.append((
+                user_id,
+                conversation_for(record.get("conversation_id")),
+                record.get("role"),
+                record.get("content"),
+                record.get("image_blob"),
+                record.get("timestamp"),
+            ))
+    cursor.executemany(
+        "INSERT INTO messages (user_id, conversation_id, role, content, image_blob, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, coalesce(?, CURRENT_TIMESTAMP))",
+        messages
+    )
+    return created
+
+
+async def import_ndjson(user_id: int, chunks: AsyncIterator[bytes]) -> dict:
+    # Conversations are always created anew for the importing user; ids in
+    # the file only tie messages to their conversation. Batches that were
+    # committed before a bad line stay imported.
+    conversation_ids = {}
+    batch = []
+    stats = {"conversations": 0, "messages": 0, "images": 0, "missing_images": 0}
+
+    async def flush():
+        created = await database.write(lambda conn: _insert_batch(conn, user_id, batch, conversation_ids))
+        conversation_ids.update(created)
+        stats["conversations"] += len(created)
+        stats["messages"] += sum(1 for record in batch if record["type"] == "message")
+        batch.clear()
+
+    async for number, line in _lines(chunks):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ArchiveError(f"Line {number} is not valid JSON: {e}")
+        kind = record.get("type") if isinstance(record, dict) else None
+        if kind == "export":
+            if record.get("version") != FORMAT_VERSION:
+                raise ArchiveError(f"Unsupported export version {record.get('version')!r}")
+            continue
+        if kind not in ("conversation", "message"):
+            raise ArchiveError(f"Line {number} has unknown record type {kind!r}")
+        reference = record.get("id" if kind == "conversation" else "conversation_id")
+        if reference is not None and not isinstance(reference, (int, str)):
+            raise ArchiveError(f"Line {number} has an invalid conversation id")
+        for field in TEXT_FIELDS[kind]:
+            if record.get(field) is not None and not isinstance(record[field], str):
+                raise ArchiveError(f"Line {number} has an invalid {field}: expected a string")
+        if kind == "message" and not record.get("role"):
+            raise ArchiveError(f"Line {number} is a message without a role")
+
+        if kind == "message":
+            if record.get("image"):
+                try:
+                    record["image_blob"] = await asyncio.to_thread(blob_store.put_b64, record.pop("image"))
+                except Exception as e:
+                    raise ArchiveError(f"Line {number} has an unreadable image: {e}")
+            blob = record.get("image_blob")
+            if blob and not (blob_store.is_digest(blob) and await asyncio.to_thread(os.path.exists, blob_store.blob_path(blob))):
+                # Referenced from another server's blob store; keep the text only.
+                record["image_blob"] = None
+                stats["missing_images"] += 1
+            elif blob:
+                stats["images"] += 1
+
+        batch.append(record)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    if batch:
+        await flush()
+    return stats
@@ -0,0 +1,131 @@
+"""
+Change-background compositing: the previous pipeline (rembg cutout encoded
+to PNG, decoded again, background stretched with the default resize,
+alpha_composite, PNG encode at the default level) against the in-memory NumPy
+path in image_engine (mask array, aspect-preserving fit, feathered blend,
+one final encode).
+
+Mask inference is identical for both and is not timed: a synthetic image and
+elliptical mask stand in for the upload and rembg's output. The inputs are
+built once in the parent; each variant runs in a fresh process that resets
+its peak RSS (Linux /proc/self/clear_refs) after receiving them, so the
+reported growth covers the variant only. Elsewhere the ru_maxrss delta is
+used, which also counts unpickling the inputs.
+
+Run from the backend directory:
+    python -m benchmarks.bench_compositing --sizes 1024x768 4000x3000 6000x4000
+"""
+import argparse
+import io
+import gc
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import image_engine
+
+
+def make_inputs(width: int, height: int) -> tuple[np.ndarray, np.ndarray, bytes]:
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1).astype(np.uint8)
+    image = np.clip(image.astype(np.int16) + rng.integers(-12, 12, image.shape), 0, 255).astype(np.uint8)
+    inside = ((x - width / 2) / (width * 0.35)) ** 2 + ((y - height / 2) / (height * 0.4)) ** 2 <= 1
+    mask = np.where(inside, 255, 0).astype(np.uint8)
+
+    # The image generator returns 1024x1024 PNGs.
+    background = Image.fromarray(rng.integers(0, 255, (1024, 1024, 3), dtype=np.uint8))
+    buffered = io.BytesIO()
+    background.save(buffered, format="PNG")
+    return image, mask, buffered.getvalue()
+
+
+def baseline(image: np.ndarray, mask: np.ndarray, background_bytes: bytes) -> bytes:
+    # rembg.remove() on bytes input returns the cutout as PNG bytes...
+    cutout = Image.fromarray(np.dstack([image, mask]), "RGBA")
+    buffered = io.BytesIO()
+    cutout.save(buffered, format="PNG")
+    foreground_bytes = buffered.getvalue()
+
+    # ...which the old _composite decoded again.
+    foreground = Image.open(io.BytesIO(foreground_bytes)).convert("RGBA")
+    background = Image.open(io.BytesIO(background_bytes)).convert("RGBA")
+    background = background.resize(foreground.size)
+    combined = Image.alpha_composite(background, foreground)
+    buffered = io.BytesIO()
+    combined.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def vectorized(image: np.ndarray, mask: np.ndarray, background_bytes: bytes) -> bytes:
+    return image_engine.composite_arrays(image, mask, background_bytes)
+
+
+VARIANTS = {"baseline (PIL, PNG round trip)": baseline, "numpy (in-memory)": vectorized}
+
+
+def _status_mib(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise OSError(f"no {field} in /proc/self/status")
+
+
+def _maxrss_mib() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def reset_peak_rss():
+    # Returns a function giving the peak RSS growth in MiB since this call.
+    gc.collect()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # resets VmHWM to the current RSS
+        before = _status_mib("VmRSS")
+        return lambda: _status_mib("VmHWM") - before
+    except OSError:
+        before = _maxrss_mib()
+        return lambda: _maxrss_mib() - before
+
+
+def run_variant(name: str, inputs: tuple, runs: int, results):
+    image, mask, background_bytes = inputs
+    peak_growth = reset_peak_rss()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = VARIANTS[name](image, mask, background_bytes)
+        samples.append((time.perf_counter() - start) * 1000)
+    results.put((statistics.median(samples), peak_growth(), len(output)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["1024x768", "4000x3000"])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'size':<12}{'variant':<34}{'median ms':>11}{'peak RSS +MiB':>15}{'output KiB':>12}")
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        inputs = make_inputs(width, height)
+        for name in VARIANTS:
+            results = context.Queue()
+            process = context.Process(target=run_variant, args=(name, inputs, args.runs, results))
+            process.start()
+            median_ms, peak_mib, output_bytes = results.get()
+            process.join()
+            print(f"{size:<12}{name:<34}{median_ms:>11.0f}{peak_mib:>15.1f}{output_bytes / 1024:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Latency of the chat history and conversation-list queries as users.db grows,
+before (schema v2) and after the history indexes (latest schema).
+
+Run from the backend directory:
+    python -m benchmarks.bench_history_queries --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import database
+
+HISTORY_QUERY = "SELECT role, content, image FROM messages WHERE user_id = ? AND conversation_id = ? ORDER BY id DESC LIMIT 10"
+CONVERSATIONS_QUERY = "SELECT * FROM conversations WHERE user_id = ? ORDER BY updated_at DESC"
+
+
+def populate(conn: sqlite3.Connection, messages: int, users: int, conversations_per_user: int):
+    conversations = users * conversations_per_user
+    conn.executemany(
+        "INSERT INTO conversations (id, user_id, title, updated_at) VALUES (?, ?, ?, datetime('now', ?))",
+        ((cid, (cid - 1) % users + 1, f"Conversation {cid}", f"-{cid} seconds") for cid in range(1, conversations + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO messages (user_id, conversation_id, role, content) VALUES (?, ?, ?, ?)",
+        (((i % conversations) % users + 1, i % conversations + 1, "user" if i % 2 == 0 else "ai", f"message {i}")
+         for i in range(messages)),
+    )
+    conn.commit()
+
+
+def time_query(conn: sqlite3.Connection, query: str, make_params, runs: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(runs):
+        params = make_params()
+        start = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def run(size: int, users: int, conversations_per_user: int, runs: int):
+    conversations = users * conversations_per_user
+    rng = random.Random(size)
+
+    def history_params():
+        cid = rng.randint(1, conversations)
+        return ((cid - 1) % users + 1, cid)
+
+    def conversation_params():
+        return (rng.randint(1, users),)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = database.connect(os.path.join(tmp, "bench.db"))
+        database.migrate(conn, target=2)
+        populate(conn, size, users, conversations_per_user)
+
+        results = {}
+        for label in ("v2 (no indexes)", "latest (indexed)"):
+            if label.startswith("latest"):
+                database.migrate(conn)
+                conn.execute("ANALYZE")
+            results[label] = (
+                time_query(conn, HISTORY_QUERY, history_params, runs),
+                time_query(conn, CONVERSATIONS_QUERY, conversation_params, runs),
+            )
+        conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--conversations-per-user", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'messages':>10}  {'schema':<16}  {'history p50/p95 ms':>20}  {'conversations p50/p95 ms':>26}")
+    for size in args.sizes:
+        for label, (history, listing) in run(size, args.users, args.conversations_per_user, args.runs).items():
+            print(f"{size:>10}  {label:<16}  {history[0]:>9.3f} / {history[1]:<8.3f}  {listing[0]:>12.3f} / {listing[1]:<10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Offline accuracy and latency of the local intent classifier against the
+keyword fallback classify_intent_llm used before it.
+
+Run from the backend directory:
+    python -m benchmarks.bench_intent_classifier
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from intent_model.classifier import IntentClassifier, load_examples, threshold
+
+EVAL_DATA = os.path.join(os.path.dirname(__file__), "intent_eval.json")
+
+
+def keyword_fallback(message: str) -> str:
+    # The previous fallback branch of classify_intent_llm, verbatim.
+    msg = message.lower()
+    if any(word in msg for word in ["image", "picture", "draw", "generate"]):
+        return "image_generation"
+    elif any(word in msg for word in ["code", "python", "script", "function", "debug"]):
+        return "research_coding"
+    else:
+        return "casual_chat"
+
+
+def latency_us(fn, texts, repeat):
+    samples = []
+    for _ in range(repeat):
+        for text in texts:
+            start = time.perf_counter()
+            fn(text)
+            samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, help="one threshold for every label (default: the per-label thresholds)")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(EVAL_DATA) as f:
+        dataset = [(text, label) for label, texts in json.load(f).items() for text in texts]
+    texts = [text for text, _ in dataset]
+
+    start = time.perf_counter()
+    classifier = IntentClassifier(load_examples())
+    train_ms = (time.perf_counter() - start) * 1000
+
+    keyword_correct = sum(keyword_fallback(text) == label for text, label in dataset)
+    predictions = [(classifier.classify(text), label) for text, label in dataset]
+    local_correct = sum(predicted == label for (predicted, _), label in predictions)
+    confident = [(predicted, label) for (predicted, confidence), label in predictions
+                 if confidence >= (args.threshold if args.threshold is not None else threshold(predicted))]
+    confident_correct = sum(predicted == label for predicted, label in confident)
+
+    print(f"eval examples: {len(dataset)}, model trained in {train_ms:.1f}ms")
+    print(f"keyword fallback accuracy:   {keyword_correct / len(dataset):.1%}")
+    print(f"local classifier accuracy:   {local_correct / len(dataset):.1%}")
+    print(f"answered locally at >= {args.threshold or 'label thresholds'}: {len(confident) / len(dataset):.1%} "
+          f"(accuracy {confident_correct / max(len(confident), 1):.1%}), rest go to the LLM")
+
+    for name, fn in (("keyword fallback", keyword_fallback), ("local classifier", classifier.classify)):
+        p50, p99 = latency_us(fn, texts, args.repeat)
+        print(f"{name:<18} latency p50 {p50:.1f}us  p99 {p99:.1f}us")
+
+
+if __name__ == "__main__":
+    main()
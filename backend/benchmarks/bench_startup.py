@@ -0,0 +1,84 @@
+"""
+Backend cold start: time from launching uvicorn to the first successful
+GET /api/health, plus the bare `import main` time, over a few runs on a
+throwaway users.db. Useful for comparing import-time changes and the cost of
+WARMUP=true (which should not delay the first healthy response, since the
+warm-up runs in the background after startup).
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --warmup
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_env(tmp: str, warmup: bool) -> dict:
+    return dict(os.environ,
+                DB_NAME=os.path.join(tmp, "users.db"),
+                BLOB_DIR=os.path.join(tmp, "blobs"),
+                GROQ_API_KEY=os.environ.get("GROQ_API_KEY", "bench"),
+                WARMUP="true" if warmup else "false")
+
+
+def time_import(env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def time_to_healthy(env: dict, port: int, timeout: float = 120) -> float:
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        raise RuntimeError(f"/api/health not up within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="start with WARMUP=true")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    imports, healthy = [], []
+    for _ in range(args.runs):
+        # Fresh database each run, so migrations are part of the measurement.
+        with tempfile.TemporaryDirectory() as tmp:
+            env = app_env(tmp, args.warmup)
+            imports.append(time_import(env))
+        with tempfile.TemporaryDirectory() as tmp:
+            healthy.append(time_to_healthy(app_env(tmp, args.warmup), args.port))
+
+    print(f"runs {args.runs}, warmup {'on' if args.warmup else 'off'}")
+    print(f"import main:           median {statistics.median(imports) * 1000:.0f}ms, min {min(imports) * 1000:.0f}ms")
+    print(f"first healthy /health: median {statistics.median(healthy) * 1000:.0f}ms, min {min(healthy) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
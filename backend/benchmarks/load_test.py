@@ -0,0 +1,233 @@
+"""
+Load test for the /api/chat pipeline against local stand-ins for Euron and
+Groq (benchmarks/stub_upstream.py), so throughput and tail latency can be
+measured without touching the real providers.
+
+Starts the stub and the backend as uvicorn subprocesses on a throwaway
+users.db, registers a user, then drives concurrent chats for each intent and
+reports p50/p95/p99 latency and requests/sec per intent. All traffic comes
+from one user, so admission control (admission.py) is switched off unless
+--with-admission is given; 429s are counted apart from errors. A probe thread
+measures SQLite write-lock wait on the same database file while the load
+runs, and history reads are timed alongside the chats.
+
+Run from the backend directory:
+    python -m benchmarks.load_test --concurrency 32 --duration 30 --latency-ms 300 --failure-rate 0.02
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Messages chosen so the local intent model routes them deterministically;
+# "llm_classified" is deliberately ambiguous and goes through the Groq stub.
+INTENT_MESSAGES = {
+    "casual_chat": "hello how are you today",
+    "research_coding": "write a python function to merge two sorted lists",
+    "image_generation": "generate an image of a lighthouse in a storm",
+    "personal_automation": "send email to stub@example.com saying hello",
+    "llm_classified": "zebra quantum banana",
+}
+
+
+def percentile(samples, p):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def start_server(module: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_until_up(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class LockProbe(threading.Thread):
+    # Periodically takes and releases the SQLite write lock to see how long
+    # a writer has to wait while the backend is under load.
+
+    def __init__(self, db_path: str, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.waits_ms = []
+        self.timeouts = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        while not self._halt.is_set():
+            start = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("ROLLBACK")
+                self.waits_ms.append((time.perf_counter() - start) * 1000)
+            except sqlite3.OperationalError:
+                self.timeouts += 1
+            self._halt.wait(self.interval)
+        conn.close()
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+async def run_load(base_url: str, token: str, intents: list, concurrency: int, duration: float, cache_busting: bool):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    rejected = defaultdict(int)
+    history_ms = []
+    counter = itertools.count()
+    headers = {"Authorization": f"Bearer {token}"}
+    deadline = time.monotonic() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=120,
+                                 limits=httpx.Limits(max_connections=concurrency + 4)) as client:
+
+        async def chat_worker(worker_id: int):
+            intent_cycle = itertools.cycle(intents[worker_id % len(intents):] + intents[:worker_id % len(intents)])
+            conversation_id = None
+            while time.monotonic() < deadline:
+                intent = next(intent_cycle)
+                message = INTENT_MESSAGES[intent]
+                if cache_busting:
+                    # Unique suffix so the response cache and request coalescing do not hide upstream cost.
+                    message = f"{message} #{next(counter)}"
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/api/chat", json={"message": message, "conversation_id": conversation_id})
+                    if response.status_code == 429:
+                        rejected[intent] += 1
+                        continue
+                    if response.status_code != 200:
+                        errors[intent] += 1
+                        continue
+                    conversation_id = response.json().get("conversation_id")
+                    latencies[intent].append((time.perf_counter() - start) * 1000)
+                except httpx.HTTPError:
+                    errors[intent] += 1
+
+        async def history_reader():
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    await client.get("/api/conversations")
+                    history_ms.append((time.perf_counter() - start) * 1000)
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.1)
+
+        await asyncio.gather(history_reader(), *(chat_worker(i) for i in range(concurrency)))
+
+    return latencies, errors, rejected, history_ms
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "users.db")
+        stub_env = dict(os.environ,
+                        STUB_LATENCY_MS=str(args.latency_ms),
+                        STUB_JITTER_MS=str(args.jitter_ms),
+                        STUB_FAILURE_RATE=str(args.failure_rate))
+        stub_url = f"http://127.0.0.1:{args.stub_port}"
+        app_env = dict(os.environ,
+                       EURON_BASE_URL=stub_url,
+                       GROQ_BASE_URL=stub_url,
+                       GROQ_API_KEY="stub",
+                       DB_NAME=db_path,
+                       BLOB_DIR=os.path.join(tmp, "blobs"),
+                       SMTP_EMAIL="",
+                       SMTP_PASSWORD="")
+        if not args.with_admission:
+            # No per-intent concurrency limits and an effectively bottomless user bucket.
+            app_env.update(ADMISSION_CONCURRENCY="", ADMISSION_USER_RATE="1000000", ADMISSION_USER_BURST="1000000")
+
+        stub = start_server("benchmarks.stub_upstream:app", args.stub_port, stub_env)
+        backend = start_server("main:app", args.port, app_env)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            await wait_until_up(f"{stub_url}/stats")
+            await wait_until_up(f"{base_url}/api/health")
+
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                credentials = {"username": "loadtest", "password": "loadtest"}
+                await client.post("/api/register", json=credentials)
+                token = (await client.post("/api/login", json=credentials)).json()["access_token"]
+
+            probe = LockProbe(db_path)
+            probe.start()
+            started = time.perf_counter()
+            latencies, errors, rejected, history_ms = await run_load(
+                base_url, token, args.intents, args.concurrency, args.duration, not args.allow_cache)
+            elapsed = time.perf_counter() - started
+            probe.stop()
+
+            async with httpx.AsyncClient() as client:
+                upstream_calls = (await client.get(f"{stub_url}/stats")).json()
+        finally:
+            for process in (backend, stub):
+                process.terminate()
+                process.wait()
+
+    print(f"concurrency {args.concurrency}, {elapsed:.1f}s, stub latency {args.latency_ms}+{args.jitter_ms}ms, failure rate {args.failure_rate}, "
+          f"admission control {'on' if args.with_admission else 'off'}")
+    print(f"{'intent':<22}{'ok':>7}{'err':>6}{'429':>6}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    all_samples = []
+    for intent in args.intents:
+        samples = latencies[intent]
+        all_samples.extend(samples)
+        print(f"{intent:<22}{len(samples):>7}{errors[intent]:>6}{rejected[intent]:>6}{len(samples) / elapsed:>8.1f}"
+              f"{percentile(samples, 0.50):>9.0f}{percentile(samples, 0.95):>9.0f}{percentile(samples, 0.99):>9.0f}")
+    print(f"{'total':<22}{len(all_samples):>7}{sum(errors.values()):>6}{sum(rejected.values()):>6}{len(all_samples) / elapsed:>8.1f}"
+          f"{percentile(all_samples, 0.50):>9.0f}{percentile(all_samples, 0.95):>9.0f}{percentile(all_samples, 0.99):>9.0f}")
+    print(f"conversation list reads: {len(history_ms)}, p50 {percentile(history_ms, 0.5):.1f}ms, p99 {percentile(history_ms, 0.99):.1f}ms")
+    if probe.waits_ms:
+        print(f"sqlite write-lock wait: p50 {statistics.median(probe.waits_ms):.2f}ms, "
+              f"p99 {percentile(probe.waits_ms, 0.99):.2f}ms, max {max(probe.waits_ms):.2f}ms, busy timeouts {probe.timeouts}")
+    print(f"upstream calls: {upstream_calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--intents", nargs="+", default=list(INTENT_MESSAGES), choices=list(INTENT_MESSAGES))
+    parser.add_argument("--allow-cache", action="store_true", help="repeat identical prompts so caches and coalescing can kick in")
+    parser.add_argument("--with-admission", action="store_true", help="keep the configured admission limits (one user, so expect 429s)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Local stand-in for the Euron and Groq APIs used by the backend, for load
+tests that must not touch (or pay for) the real providers.
+
+Serves:
+    POST /chat/completions              Euron text/vision completions (incl. stream=true)
+    POST /images/generations            Euron image generation (b64_json)
+    POST /openai/v1/chat/completions    Groq chat completions (intent + automation parsing)
+
+Behaviour is controlled with environment variables:
+    STUB_LATENCY_MS     base latency per call (default 200)
+    STUB_JITTER_MS      extra uniform random latency (default 100)
+    STUB_FAILURE_RATE   fraction of calls answered with HTTP 500 (default 0)
+    STUB_TOKENS         tokens per completion / streamed chunks (default 40)
+
+Run:
+    uvicorn benchmarks.stub_upstream:app --port 9100
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "200"))
+STUB_JITTER_MS = float(os.getenv("STUB_JITTER_MS", "100"))
+STUB_FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", "0"))
+STUB_TOKENS = int(os.getenv("STUB_TOKENS", "40"))
+
+# 1x1 transparent PNG
+STUB_PNG_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+
+app = FastAPI(title="AskGPT Stub Upstream")
+calls = {"completions": 0, "images": 0, "groq": 0, "failures": 0}
+
+
+async def simulate(kind: str):
+    calls[kind] += 1
+    await asyncio.sleep((STUB_LATENCY_MS + random.uniform(0, STUB_JITTER_MS)) / 1000)
+    if random.random() < STUB_FAILURE_RATE:
+        calls["failures"] += 1
+        raise HTTPException(status_code=500, detail="stub failure")
+
+
+def completion_body(model: str, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": STUB_TOKENS, "total_tokens": 10 + STUB_TOKENS},
+    }
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    model = payload.get("model", "stub")
+
+    if not payload.get("stream"):
+        await simulate("completions")
+        return completion_body(model, " ".join(f"token{i}" for i in range(STUB_TOKENS)))
+
+    # Time to first token is the configured latency, the rest trickles out.
+    await simulate("completions")
+
+    async def events():
+        for i in range(STUB_TOKENS):
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": f"token{i} "}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(0.005)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/images/generations")
+async def images_generations(request: Request):
+    await simulate("images")
+    return {"created": int(time.time()), "data": [{"b64_json": STUB_PNG_B64}]}
+
+
+@app.post("/openai/v1/chat/completions")
+async def groq_chat_completions(request: Request):
+    payload = await request.json()
+    await simulate("groq")
+    system_prompt = payload["messages"][0]["content"]
+    if "automation parser" in system_prompt:
+        # Never an app/file intent, so a load test cannot spawn processes.
+        content = json.dumps({"intent": "SEND_EMAIL", "params": {"to_email": "stub@example.com", "subject": "Stub", "body": "Hello"}})
+    else:
+        content = random.choice(["casual_chat", "research_coding", "image_generation"])
+    return completion_body(payload.get("model", "stub"), content)
+
+
+@app.get("/stats")
+async def stats():
+    return calls
@@ -0,0 +1,89 @@
+import base64
+import hashlib
+import os
+import re
+import tempfile
+from typing import Optional
+
+# --- Configuration ---
+BLOB_DIR = os.getenv("BLOB_DIR", "blobs")
+
+# Images are stored once on disk under their SHA-256, so the same upload or
+# generated image referenced by many messages costs one file. The database
+# only keeps the hex digest.
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def is_digest(value: str) -> bool:
+    return bool(value) and _DIGEST_RE.fullmatch(value) is not None
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def decode_b64(image_str: str) -> bytes:
+    # Accepts raw base64 as well as "data:image/...;base64," URLs from the frontend.
+    if "," in image_str:
+        image_str = image_str.split(",")[1]
+    padding = len(image_str) % 4
+    if padding:
+        image_str += "=" * (4 - padding)
+    return base64.b64decode(image_str)
+
+
+def put(data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob.
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    return digest
+
+
+def put_b64(image_str: Optional[str]) -> Optional[str]:
+    if not image_str:
+        return None
+    return put(decode_b64(image_str))
+
+
+def get(digest: str) -> Optional[bytes]:
+    if not is_digest(digest):
+        return None
+    try:
+        with open(blob_path(digest), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def get_b64(digest: str) -> Optional[str]:
+    data = get(digest)
+    return base64.b64encode(data).decode("utf-8") if data is not None else None
+
+
+def content_type(digest: str) -> str:
+    with open(blob_path(digest), "rb") as f:
+        head = f.read(12)
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "application/octet-stream"
+
+
+def image_url(digest: Optional[str]) -> Optional[str]:
+    return f"/api/images/{digest}" if digest else None
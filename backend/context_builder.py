@@ -0,0 +1,102 @@
+import math
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+# Token-budgeted prompt assembly: the most recent messages are packed into a
+# per-model prompt budget, newest first. Anything older than that is meant to
+# be covered by the conversation summary instead of being re-sent verbatim.
+
+# --- Configuration ---
+CONTEXT_HISTORY_MESSAGES = int(os.getenv("CONTEXT_HISTORY_MESSAGES", "40"))
+CONTEXT_MAX_MESSAGE_TOKENS = int(os.getenv("CONTEXT_MAX_MESSAGE_TOKENS", "1500"))
+CONTEXT_SUMMARY_TRIGGER_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TRIGGER_TOKENS", "3000"))
+CONTEXT_KEEP_RECENT_MESSAGES = int(os.getenv("CONTEXT_KEEP_RECENT_MESSAGES", "6"))
+
+# Prompt tokens (system prompt, summary, history and the new message) per model.
+DEFAULT_BUDGET = 4000
+MODEL_BUDGETS = {
+    "gpt-4o": 8000,
+    "gpt-4.1-nano": 4000,
+    "gemini-2.5-pro": 16000,
+}
+
+MESSAGE_OVERHEAD = 4  # role and separators per chat message
+IMAGE_TOKENS = 1100  # roughly one high-detail image in a vision request
+CHARS_PER_TOKEN = 4.0  # estimate when no tokenizer is available for the model
+
+
+def _parse_budgets(value: str) -> dict:
+    # CONTEXT_BUDGETS="gpt-4o=8000,gemini-2.5-pro=16000"
+    budgets = {}
+    for item in value.split(","):
+        model, _, tokens = item.partition("=")
+        if model.strip() and tokens.strip():
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+
+MODEL_BUDGETS.update(_parse_budgets(os.getenv("CONTEXT_BUDGETS", "")))
+
+
+def budget_for(model: str) -> int:
+    return MODEL_BUDGETS.get(model, DEFAULT_BUDGET)
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    # tiktoken is optional; without it, or for models it does not know
+    # (Gemini), token counts are estimated from the text length.
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return None
+
+
+def count_tokens(text: Optional[str], model: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate(text: Optional[str], max_tokens: int, model: str) -> str:
+    text = text or ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    # Keep the head and the tail: the middle of a pasted log file is rarely
+    # what the next question is about.
+    keep = int(max_tokens * CHARS_PER_TOKEN)
+    head = keep * 2 // 3
+    return f"{text[:head]}\n[... truncated ...]\n{text[-(keep - head):]}"
+
+
+def pack_history(history: List[dict], model: str, budget: int) -> List[dict]:
+    # Newest messages first until the budget is spent; oversized messages are
+    # truncated rather than dropping everything behind them. Returned in
+    # chronological order.
+    packed = []
+    used = 0
+    for msg in reversed(history):
+        content = truncate(msg.get("content"), CONTEXT_MAX_MESSAGE_TOKENS, model)
+        cost = count_tokens(content, model) + MESSAGE_OVERHEAD
+        if used + cost > budget:
+            break
+        packed.append({**msg, "content": content})
+        used += cost
+    return packed[::-1]
+
+
+def needs_summary(pending: List[dict], model: str) -> bool:
+    # pending: messages not yet folded into the summary, oldest first.
+    if len(pending) <= CONTEXT_KEEP_RECENT_MESSAGES:
+        return False
+    if len(pending) >= CONTEXT_HISTORY_MESSAGES:
+        return True
+    return sum(count_tokens(msg["content"], model) for msg in pending) > CONTEXT_SUMMARY_TRIGGER_TOKENS
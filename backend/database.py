@@ -0,0 +1,442 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import blob_store
+
+# --- Configuration ---
+DB_NAME = os.getenv("DB_NAME", "users.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "64"))
+DB_WRITE_BATCH_WAIT = float(os.getenv("DB_WRITE_BATCH_WAIT", "0.005"))
+
+
+def connect(path: str = DB_NAME) -> sqlite3.Connection:
+    # check_same_thread=False because pooled connections move between
+    # threadpool workers; each one is only ever used by one thread at a time.
+    conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL lets /api/history and /api/conversations read while the writer commits.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# --- Read Pool ---
+class ConnectionPool:
+    def __init__(self, path: str = DB_NAME, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return connect(self.path)
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+# --- Batched Writer ---
+class BatchWriter:
+    # A single thread owns the only write connection. Jobs from concurrent
+    # requests are drained from a queue and committed together in one
+    # transaction, each inside its own SAVEPOINT so a failing job does not
+    # roll back its neighbours.
+
+    def __init__(self, path: str = DB_NAME, batch_size: int = DB_WRITE_BATCH_SIZE, batch_wait: float = DB_WRITE_BATCH_WAIT):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._jobs = 0
+        self._batches = 0
+        self._failed_batches = 0
+        self._commit_seconds = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], object]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(result=None, error=None):
+            if future.cancelled():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        self._put(fn, lambda result=None, error=None: loop.call_soon_threadsafe(resolve, result, error))
+        return future
+
+    def submit_sync(self, fn: Callable[[sqlite3.Connection], object]):
+        # For callers running outside the event loop (worker threads).
+        done = threading.Event()
+        outcome = {}
+
+        def resolve(result=None, error=None):
+            outcome["result"], outcome["error"] = result, error
+            done.set()
+
+        self._put(fn, resolve)
+        done.wait()
+        if outcome["error"] is not None:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "jobs": self._jobs,
+            "batches": self._batches,
+            "failed_batches": self._failed_batches,
+            "avg_batch_size": round(self._jobs / self._batches, 2) if self._batches else 0,
+            "avg_batch_ms": round(self._commit_seconds / self._batches * 1000, 2) if self._batches else 0,
+        }
+
+    def _put(self, fn, resolve):
+        self.start()
+        self._queue.put((fn, resolve))
+
+    def _next_batch(self) -> Optional[list]:
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        conn = connect(self.path)
+        conn.isolation_level = None  # Manual BEGIN/COMMIT
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list):
+        outcomes = []
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, _ in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((fn(conn), None))
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    outcomes.append((None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            print(f"Error committing write batch: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(None, e)] * len(batch)
+            self._failed_batches += 1
+        self._jobs += len(batch)
+        self._batches += 1
+        self._commit_seconds += time.perf_counter() - started
+
+        for (_, resolve), (result, error) in zip(batch, outcomes):
+            try:
+                resolve(result, error)
+            except RuntimeError:
+                pass # Submitting loop already closed
+
+
+pool = ConnectionPool()
+writer = BatchWriter()
+
+
+# --- Access Helpers ---
+def read_sync(fn: Callable[[sqlite3.Connection], object]):
+    with pool.connection() as conn:
+        return fn(conn)
+
+
+async def read(fn: Callable[[sqlite3.Connection], object]):
+    # Runs the query on a threadpool worker so the event loop keeps serving.
+    return await asyncio.to_thread(read_sync, fn)
+
+
+async def write(fn: Callable[[sqlite3.Connection], object]):
+    return await writer.submit(fn)
+
+
+def close():
+    writer.stop()
+    pool.close()
+
+
+# --- Schema Migrations ---
+# Each migration runs once, in order, inside its own transaction. The applied
+# version is tracked in PRAGMA user_version, so add new steps to the end of
+# MIGRATIONS and never edit one that has shipped.
+
+def _create_base_tables(conn: sqlite3.Connection):
+    # Users Table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            hashed_password TEXT NOT NULL
+        )
+    ''')
+
+    # Conversations Table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            title TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Messages Table (for History)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            conversation_id INTEGER,
+            role TEXT,
+            content TEXT,
+            image TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(conversation_id) REFERENCES conversations(id)
+        )
+    ''')
+
+
+def _add_messages_conversation_id(conn: sqlite3.Connection):
+    # Databases created before conversations existed lack this column.
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(messages)")}
+    if "conversation_id" not in columns:
+        conn.execute("ALTER TABLE messages ADD COLUMN conversation_id INTEGER REFERENCES conversations(id)")
+
+
+def _add_history_indexes(conn: sqlite3.Connection):
+    # Chat history: WHERE user_id = ? AND conversation_id = ? ORDER BY id DESC LIMIT 10.
+    # The rowid (id) is implicitly the last index column, so the ORDER BY is an index walk.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_user_conversation ON messages(user_id, conversation_id)")
+    # Conversation list: WHERE user_id = ? ORDER BY updated_at DESC. Including the
+    # title makes the listing a pure index scan without touching the table.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user_updated ON conversations(user_id, updated_at DESC, title)")
+
+
+def _move_images_to_blob_store(conn: sqlite3.Connection):
+    # Base64 images used to live inline in messages.image. Move each one to
+    # the blob store and keep only its digest; rows are handled one at a time
+    # so a multi-GB table never has to fit in memory. Run VACUUM afterwards
+    # to give the freed pages back to the filesystem.
+    conn.execute("ALTER TABLE messages ADD COLUMN image_blob TEXT")
+    ids = [row[0] for row in conn.execute("SELECT id FROM messages WHERE image IS NOT NULL")]
+    for message_id in ids:
+        image = conn.execute("SELECT image FROM messages WHERE id = ?", (message_id,)).fetchone()[0]
+        try:
+            digest = blob_store.put_b64(image)
+        except Exception as e:
+            print(f"Skipping unreadable image on message {message_id}: {e}")
+            digest = None
+        conn.execute("UPDATE messages SET image_blob = ?, image = NULL WHERE id = ?", (digest, message_id))
+
+
+def _add_pagination_indexes(conn: sqlite3.Connection):
+    # Keyset pages of the conversation list order by (updated_at, id); with id
+    # as an explicit column the whole page is one reverse index range scan.
+    conn.execute("DROP INDEX IF EXISTS idx_conversations_user_updated")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user_updated_id ON conversations(user_id, updated_at, id, title)")
+    # History pages across all of a user's conversations (no conversation_id).
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user_id)")
+
+
+def _add_conversation_summaries(conn: sqlite3.Connection):
+    # Running summary of the messages that no longer fit the prompt verbatim,
+    # covering every message up to and including id summary_through.
+    conn.execute("ALTER TABLE conversations ADD COLUMN summary TEXT")
+    conn.execute("ALTER TABLE conversations ADD COLUMN summary_through INTEGER NOT NULL DEFAULT 0")
+
+
+def _add_jobs(conn: sqlite3.Connection):
+    # Background image jobs (see jobs.py); images are blob store digests.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            conversation_id INTEGER,
+            intent TEXT NOT NULL,
+            message TEXT NOT NULL,
+            image_blob TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            response TEXT,
+            model_used TEXT,
+            result_blob TEXT,
+            error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(conversation_id) REFERENCES conversations(id)
+        )
+    ''')
+    # Recovery on startup looks jobs up by status.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, updated_at)")
+
+
+def _add_search_index(conn: sqlite3.Connection):
+    # Full-text search (see search.py) over message contents and conversation
+    # titles. Both are external-content FTS5 tables, so the text is not stored
+    # twice; the views add an "owner" token (u<user_id>) that every query
+    # matches on, which keeps the per-user scoping inside the index. Triggers
+    # keep the indexes in step with every insert, update and delete. The
+    # 2 and 3 character prefix indexes keep search-as-you-type queries like
+    # "so*" from expanding into thousands of terms.
+    conn.execute("CREATE VIEW IF NOT EXISTS messages_search_source AS SELECT id, content, 'u' || coalesce(user_id, 0) AS owner FROM messages")
+    conn.execute("CREATE VIEW IF NOT EXISTS conversations_search_source AS SELECT id, title, 'u' || coalesce(user_id, 0) AS owner FROM conversations")
+    for table, column, source in (("messages", "content", "messages_search_source"), ("conversations", "title", "conversations_search_source")):
+        fts = f"{table}_fts"
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, owner, content='{source}', content_rowid='id', prefix='2 3')")
+        # The owner token is in every row of a user and would only skew bm25.
+        conn.execute(f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+        new_row = f"new.id, new.{column}, 'u' || coalesce(new.user_id, 0)"
+        old_row = f"'delete', old.id, old.{column}, 'u' || coalesce(old.user_id, 0)"
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {column}, owner) VALUES ({new_row});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}, owner) VALUES ({old_row});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column}, user_id ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}, owner) VALUES ({old_row});
+                INSERT INTO {fts}(rowid, {column}, owner) VALUES ({new_row});
+            END
+        """)
+        # Index what is already there.
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _add_job_owners(conn: sqlite3.Connection):
+    # The process currently running a job; see the leases in jobs.py.
+    conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables),
+    (2, "messages.conversation_id", _add_messages_conversation_id),
+    (3, "history and conversation list indexes", _add_history_indexes),
+    (4, "message images in blob store", _move_images_to_blob_store),
+    (5, "keyset pagination indexes", _add_pagination_indexes),
+    (6, "conversation summaries", _add_conversation_summaries),
+    (7, "background jobs", _add_jobs),
+    (8, "full-text search index", _add_search_index),
+    (9, "job owners", _add_job_owners),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Manual BEGIN/COMMIT, DDL included
+    try:
+        for version, description, apply in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            # BEGIN IMMEDIATE serialises concurrent workers starting up together;
+            # re-check the version once we hold the write lock.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if schema_version(conn) >= version:
+                    conn.execute("COMMIT")
+                    continue
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"Applied migration {version}: {description}")
+        return schema_version(conn)
+    finally:
+        conn.isolation_level = isolation_level
+
+
+def init_db():
+    conn = connect(DB_NAME)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
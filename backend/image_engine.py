@@ -0,0 +1,211 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import metrics
+
+# --- Configuration ---
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_QUEUE_LIMIT = int(os.getenv("IMAGE_QUEUE_LIMIT", "16"))
+REMBG_MODEL = os.getenv("REMBG_MODEL", "u2net")
+# Change-background output: blur radius of the mask edge in pixels, and the single final encode
+COMPOSITE_FEATHER = float(os.getenv("COMPOSITE_FEATHER", "2"))
+COMPOSITE_FORMAT = os.getenv("COMPOSITE_FORMAT", "PNG").upper()
+COMPOSITE_PNG_COMPRESS_LEVEL = int(os.getenv("COMPOSITE_PNG_COMPRESS_LEVEL", "3"))
+COMPOSITE_QUALITY = int(os.getenv("COMPOSITE_QUALITY", "90"))  # JPEG / WEBP
+COMPOSITE_BAND_ROWS = 256  # rows blended at a time, bounds the uint16 scratch memory
+
+
+class ImageEngineBusy(Exception):
+    pass
+
+
+# --- Worker Process Side ---
+# rembg/onnxruntime and PIL are only imported inside the workers, so the API
+# process never loads the model and inference never runs on the event loop.
+_session = None
+
+
+def _init_worker(model_name: str):
+    global _session
+    from rembg import new_session
+    _session = new_session(model_name)
+
+
+def _remove_background(data: bytes) -> tuple[bytes, float]:
+    from rembg import remove
+    start = time.perf_counter()
+    output = remove(data, session=_session)
+    return output, time.perf_counter() - start
+
+
+def _foreground_mask(data: bytes) -> tuple[tuple, float]:
+    # Decodes the upload once and returns it with rembg's mask as arrays, so
+    # the composite step never re-decodes an encoded cutout.
+    import numpy as np
+    from PIL import Image
+    from rembg import remove
+    start = time.perf_counter()
+    image = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+    mask = np.asarray(remove(image, session=_session, only_mask=True))
+    return (image, mask), time.perf_counter() - start
+
+
+def fit_background(background, width: int, height: int):
+    # Scale to cover width x height keeping the aspect ratio, then center-crop
+    # (a plain resize would stretch the generated square background).
+    import numpy as np
+    from PIL import Image
+    scale = max(width / background.width, height / background.height)
+    size = (max(width, round(background.width * scale)), max(height, round(background.height * scale)))
+    resized = background.resize(size, Image.Resampling.BICUBIC, reducing_gap=3.0)
+    left, top = (size[0] - width) // 2, (size[1] - height) // 2
+    return np.asarray(resized.crop((left, top, left + width, top + height)))
+
+
+def feather(mask, radius: float):
+    import numpy as np
+    from PIL import Image, ImageFilter
+    if radius <= 0:
+        return mask
+    return np.asarray(Image.fromarray(mask).filter(ImageFilter.GaussianBlur(radius)))
+
+
+def blend(foreground, mask, background):
+    # out = (fg * a + bg * (255 - a)) / 255 in integer math, a band of rows at
+    # a time so the uint16 intermediates stay small on large images.
+    import numpy as np
+    out = np.empty_like(foreground)
+    for top in range(0, foreground.shape[0], COMPOSITE_BAND_ROWS):
+        rows = slice(top, top + COMPOSITE_BAND_ROWS)
+        alpha = mask[rows, :, None].astype(np.uint16)
+        band = foreground[rows].astype(np.uint16) * alpha
+        band += background[rows].astype(np.uint16) * (255 - alpha)
+        band += 127
+        band //= 255
+        out[rows] = band
+    return out
+
+
+def encode(array, image_format: str = COMPOSITE_FORMAT) -> bytes:
+    from PIL import Image
+    buffered = io.BytesIO()
+    if image_format == "PNG":
+        Image.fromarray(array).save(buffered, format="PNG", compress_level=COMPOSITE_PNG_COMPRESS_LEVEL)
+    else:
+        Image.fromarray(array).save(buffered, format=image_format, quality=COMPOSITE_QUALITY)
+    return buffered.getvalue()
+
+
+def composite_arrays(image, mask, background_bytes: bytes) -> bytes:
+    from PIL import Image
+    height, width = mask.shape
+    background = fit_background(Image.open(io.BytesIO(background_bytes)).convert("RGB"), width, height)
+    return encode(blend(image, feather(mask, COMPOSITE_FEATHER), background))
+
+
+def _change_background(image, mask, background_bytes: bytes) -> tuple[bytes, float]:
+    start = time.perf_counter()
+    output = composite_arrays(image, mask, background_bytes)
+    return output, time.perf_counter() - start
+
+
+def _ping() -> tuple[int, float]:
+    return os.getpid(), 0.0
+
+
+# --- API Process Side ---
+class ImageEngine:
+    def __init__(self, workers: int = IMAGE_WORKERS, queue_limit: int = IMAGE_QUEUE_LIMIT, model_name: str = REMBG_MODEL):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.model_name = model_name
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latencies = deque(maxlen=500)
+
+    def start(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the API process has live threads (DB writer,
+            # threadpool) that must not be duplicated into the workers.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name,),
+            )
+        return self._executor
+
+    async def warm_up(self):
+        # Spawns the workers (each loads the rembg model in its initializer)
+        # before the first request has to wait for that.
+        loop = asyncio.get_running_loop()
+        executor = self.start()
+        await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _submit(self, job, *args):
+        # Jobs beyond the queue limit are rejected up front instead of piling
+        # up behind a saturated pool.
+        if self._pending >= self.queue_limit:
+            self._rejected += 1
+            raise ImageEngineBusy(f"{self._pending} image jobs already queued")
+
+        self._pending += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            output, run_time = await loop.run_in_executor(self.start(), job, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge image); start fresh next time.
+            self._executor = None
+            raise
+        finally:
+            self._pending -= 1
+
+        total = time.perf_counter() - submitted
+        self._completed += 1
+        self._latencies.append(total)
+        metrics.IMAGE_JOB_SECONDS.observe(total, job=job.__name__.lstrip("_"))
+        print(f"image job {job.__name__}: total {total * 1000:.0f}ms, inference {run_time * 1000:.0f}ms, queued {(total - run_time) * 1000:.0f}ms")
+        return output
+
+    async def remove_background(self, data: bytes) -> bytes:
+        return await self._submit(_remove_background, data)
+
+    async def foreground_mask(self, data: bytes) -> tuple:
+        # (RGB array, uint8 mask array) for change_background
+        return await self._submit(_foreground_mask, data)
+
+    async def change_background(self, image, mask, background: bytes) -> bytes:
+        return await self._submit(_change_background, image, mask, background)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else None
+
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p95_ms": percentile(0.95),
+        }
+
+
+engine = ImageEngine()
@@ -0,0 +1,121 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import time
+
+from cachetools import LRUCache
+
+import blob_store
+import metrics
+from singleflight import SingleFlight
+
+# Uploaded images are decoded once, downsized to what the vision model can
+# actually use and re-encoded before anything else sees them. The result is
+# what gets sent upstream, fed to background removal and stored, and it is
+# cached by the SHA-256 of the original upload.
+
+# --- Configuration ---
+# gpt-4o high detail scales images to fit 2048x2048 and then to 768px on the
+# short side, so larger uploads only cost bytes and upstream latency.
+IMAGE_MAX_LONG_SIDE = int(os.getenv("IMAGE_MAX_LONG_SIDE", "2048"))
+IMAGE_MAX_SHORT_SIDE = int(os.getenv("IMAGE_MAX_SHORT_SIDE", "768"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_PREP_CACHE_BYTES = int(os.getenv("IMAGE_PREP_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+_cache = LRUCache(maxsize=IMAGE_PREP_CACHE_BYTES, getsizeof=len)
+_flight = SingleFlight("image_prep")
+_hits = 0
+_misses = 0
+
+
+def target_size(width: int, height: int) -> tuple[int, int]:
+    scale = min(1.0, IMAGE_MAX_LONG_SIDE / max(width, height), IMAGE_MAX_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def normalize_bytes(data: bytes) -> tuple[bytes, str]:
+    # Returns (encoded image, mime type). PIL is imported here so it only
+    # loads once an image actually arrives.
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    source_format = image.format
+    orientation = image.getexif().get(0x0112, 1)  # EXIF orientation
+    # Sized from the stored dimensions: draft() below changes image.size.
+    original_size = image.size
+    size = target_size(*original_size)
+    if source_format == "JPEG":
+        # Let libjpeg decode at a reduced scale instead of full resolution.
+        image.draft("RGB", size)
+    image = ImageOps.exif_transpose(image)
+    if orientation in (5, 6, 7, 8):
+        # exif_transpose swapped width and height
+        size = size[::-1]
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if has_alpha:
+        image = image.convert("RGBA")
+        has_alpha = image.getchannel("A").getextrema()[0] < 255
+
+    if original_size == size and orientation == 1 and source_format == ("PNG" if has_alpha else "JPEG"):
+        # Already small enough and in the format we would pick; re-encoding would only lose quality.
+        return data, f"image/{source_format.lower()}"
+
+    if image.size != size:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    buffered = io.BytesIO()
+    if has_alpha:
+        # Background removal needs the alpha channel, so transparency keeps PNG.
+        image.save(buffered, format="PNG", compress_level=6)
+        return buffered.getvalue(), "image/png"
+    image.convert("RGB").save(buffered, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return buffered.getvalue(), "image/jpeg"
+
+
+def _normalize_b64(data: bytes) -> str:
+    start = time.perf_counter()
+    output, mime = normalize_bytes(data)
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage="image_normalize", intent="")
+    print(f"image normalized: {len(data)} -> {len(output)} bytes ({mime})")
+    return f"data:{mime};base64,{base64.b64encode(output).decode('utf-8')}"
+
+
+async def normalize(image_str: str) -> str:
+    # Takes base64 or a data URL, returns a data URL with the real mime type.
+    # Anything PIL cannot read is passed through untouched.
+    global _hits, _misses
+    try:
+        data = blob_store.decode_b64(image_str)
+    except Exception:
+        return image_str
+
+    key = hashlib.sha256(data).hexdigest()
+    cached = _cache.get(key)
+    if cached is not None:
+        _hits += 1
+        return cached
+    _misses += 1
+
+    try:
+        # Decoding and resizing release the GIL, a thread keeps the loop free.
+        result = await _flight.do(key, lambda: asyncio.to_thread(_normalize_b64, data))
+    except Exception as e:
+        print(f"Error normalizing image: {e}")
+        metrics.FALLBACKS.inc(kind="image_prep_error")
+        return image_str
+    if len(result) <= _cache.maxsize:
+        _cache[key] = result
+    return result
+
+
+def stats() -> dict:
+    total = _hits + _misses
+    return {
+        "hits": _hits,
+        "misses": _misses,
+        "hit_rate": round(_hits / total, 3) if total else 0,
+        "cached_bytes": _cache.currsize,
+    }
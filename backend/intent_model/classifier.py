@@ -0,0 +1,124 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Optional
+
+# --- Configuration ---
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.75"))
+# A wrong local image_generation label costs an upstream image call and
+# answers a question with a picture, so it needs more certainty.
+IMAGE_CONFIDENCE_THRESHOLD = float(os.getenv("IMAGE_CONFIDENCE_THRESHOLD", "0.9"))
+TRAINING_DATA = os.path.join(os.path.dirname(__file__), "training_data.json")
+
+LABELS = ("image_generation", "research_coding", "casual_chat")
+
+# Compiled multi-pattern matcher. A hit is strong evidence for its label and
+# is added to the model score as extra log-odds. Image nouns only count when a
+# creation verb governs them, so "what makes a good logo" or "a photo of the
+# day" stay with the model; words that are common outside programming
+# ("error", "class", "function") are likewise left to it.
+PATTERNS = {
+    "image_generation": re.compile(
+        r"^(please\s+|can\s+you\s+|could\s+you\s+)?(draw|sketch|paint|illustrate|render|doodle)\b"
+        r"|\b(draw|sketch|paint|illustrate|render|doodle|generate|create|make|design|produce)\s+(me\s+)?(an?\s+|the\s+|some\s+)?(\w+\s+){0,2}"
+        r"(image|picture|photo|portrait|painting|drawing|illustration|artwork|art|cover|banner|thumbnail"
+        r"|wallpaper|logo|poster|sticker|icon)s?\b"
+    ),
+    "research_coding": re.compile(
+        r"\b(code|coding|python|javascript|typescript|java|rust|golang|kotlin|c\+\+|sql|postgres|regex|api|apis"
+        r"|debug|traceback|stack\s+trace|segfault|compile|algorithm"
+        r"|refactor|unit\s+tests?|docker\w*|kubernetes|git|react|fastapi|django|flask|database"
+        r"|derive|theorem|equation)\b"
+    ),
+    "casual_chat": re.compile(
+        r"^(hi|hello|hey|yo|thanks|thank\s+you|ok|okay|cool|lol|good\s+(morning|afternoon|evening|night))\b"
+        r"|\b(how\s+are\s+you|what's\s+up|tell\s+me\s+a\s+joke|who\s+are\s+you|recommend|suggest)\b"
+    ),
+}
+PATTERN_BONUS = 3.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#']+")
+
+
+def tokenize(text: str) -> list[str]:
+    words = _TOKEN_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class IntentClassifier:
+    # Multinomial Naive Bayes over unigrams and bigrams, combined with the
+    # pattern matcher above. Trains in a few milliseconds from the examples
+    # shipped in training_data.json.
+
+    def __init__(self, examples: dict[str, list[str]]):
+        self.labels = tuple(examples)
+        self.vocabulary = set()
+        self.log_prior = {}
+        self.log_likelihood = {}
+        self.log_unknown = {}
+
+        counts = {label: Counter() for label in self.labels}
+        total_examples = sum(len(texts) for texts in examples.values())
+        for label, texts in examples.items():
+            self.log_prior[label] = math.log(len(texts) / total_examples)
+            for text in texts:
+                counts[label].update(tokenize(text))
+            self.vocabulary.update(counts[label])
+
+        vocabulary_size = len(self.vocabulary)
+        for label in self.labels:
+            total = sum(counts[label].values()) + vocabulary_size
+            self.log_likelihood[label] = defaultdict(float, {
+                token: math.log((count + 1) / total) for token, count in counts[label].items()
+            })
+            self.log_unknown[label] = math.log(1 / total)
+
+    def scores(self, message: str) -> dict[str, float]:
+        tokens = [t for t in tokenize(message) if t in self.vocabulary]
+        text = message.lower()
+        scores = {}
+        for label in self.labels:
+            score = self.log_prior[label]
+            likelihood = self.log_likelihood[label]
+            for token in tokens:
+                score += likelihood[token] if token in likelihood else self.log_unknown[label]
+            pattern = PATTERNS.get(label)
+            if pattern is not None and pattern.search(text):
+                score += PATTERN_BONUS
+            scores[label] = score
+        return scores
+
+    def classify(self, message: str) -> tuple[str, float]:
+        scores = self.scores(message)
+        best = max(scores.values())
+        # Softmax over log scores -> posterior probability of the best label
+        weights = {label: math.exp(score - best) for label, score in scores.items()}
+        total = sum(weights.values())
+        label = max(weights, key=weights.get)
+        return label, weights[label] / total
+
+
+def threshold(label: str) -> float:
+    # Minimum confidence for acting on a local label without asking the LLM.
+    return IMAGE_CONFIDENCE_THRESHOLD if label == "image_generation" else INTENT_CONFIDENCE_THRESHOLD
+
+
+def load_examples(path: str = TRAINING_DATA) -> dict[str, list[str]]:
+    with open(path) as f:
+        return json.load(f)
+
+
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_classifier() -> IntentClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier(load_examples())
+    return _classifier
+
+
+def classify(message: str) -> tuple[str, float]:
+    return get_classifier().classify(message)
@@ -0,0 +1,238 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Optional
+
+import blob_store
+import database
+
+# Background job queue for long-running image intents. /api/chat can hand an
+# image request off here and return a job id at once; a small pool of worker
+# tasks runs the jobs and clients poll /api/jobs/{id} or subscribe to its
+# event stream. Job state lives in the jobs table, so queued and interrupted
+# jobs are picked up again after a restart.
+#
+# Several processes (uvicorn --workers N) can share the table. A job is
+# claimed atomically before it runs and its owner renews the lease while it
+# does; only jobs whose lease has lapsed, because their process died, are
+# taken over by another process.
+
+# --- Configuration ---
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # a job that keeps taking the process down is given up
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))  # renewed every third of this while running
+
+# Intents that run as jobs when the client asks for it
+JOB_INTENTS = {"image_generation", "image_manipulation"}
+
+# handler(job row) -> (response text, model used, result image base64 or None)
+JobHandler = Callable[[dict], Awaitable[tuple[str, str, Optional[str]]]]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobFailed(Exception):
+    # Raised by a handler whose work did not produce a result; the message
+    # becomes the job's error.
+    pass
+
+
+def _select_job(conn, job_id: str) -> Optional[dict]:
+    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _recover(conn, queued_for: float = 0) -> list:
+    # Jobs whose owner stopped renewing the lease (the process died) start
+    # over. Returns those plus the jobs queued for at least queued_for
+    # seconds: at startup all of them, later only the ones no live process
+    # has picked up within a lease. Whoever claims a job first runs it.
+    conn.execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < datetime('now', ?)",
+        (f"-{JOB_RETENTION_HOURS} hours",)
+    )
+    lease = (f"-{JOB_LEASE_SECONDS} seconds",)
+    expired = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE status = 'running' AND updated_at < datetime('now', ?)", lease)]
+    conn.executemany("UPDATE jobs SET status = 'queued', owner = NULL WHERE id = ?", [(job_id,) for job_id in expired])
+    queued = [row[0] for row in conn.execute(
+        "SELECT id FROM jobs WHERE status = 'queued' AND updated_at <= datetime('now', ?) ORDER BY created_at, rowid",
+        (f"-{queued_for} seconds",)
+    )]
+    return list(dict.fromkeys(expired + queued))
+
+
+def _renew(conn, owner: str):
+    conn.execute("UPDATE jobs SET updated_at = CURRENT_TIMESTAMP WHERE owner = ? AND status = 'running'", (owner,))
+
+
+def _release(conn, owner: str):
+    conn.execute("UPDATE jobs SET status = 'queued', owner = NULL, updated_at = CURRENT_TIMESTAMP WHERE owner = ? AND status = 'running'", (owner,))
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, queue_limit: int = JOB_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._lease_task: Optional[asyncio.Task] = None
+        self._pending: set[str] = set()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handler: Optional[JobHandler] = None
+        self._finished: dict[str, asyncio.Event] = {}
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    async def start(self, handler: JobHandler):
+        self._handler = handler
+        self._queue = asyncio.Queue()
+        recovered = await database.write(_recover)
+        self._enqueue(recovered)
+        if recovered:
+            print(f"Recovered {len(recovered)} queued image jobs")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._lease_task = asyncio.create_task(self._keep_leases())
+
+    async def stop(self):
+        # Jobs interrupted here go back to 'queued' for the next start or another process.
+        tasks = self._tasks + ([self._lease_task] if self._lease_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks, self._lease_task = [], None
+        await database.write(lambda conn: _release(conn, self.owner))
+
+    def _enqueue(self, job_ids: list):
+        for job_id in job_ids:
+            if job_id not in self._pending:
+                self._pending.add(job_id)
+                self._queue.put_nowait(job_id)
+
+    async def _keep_leases(self):
+        # Renews this process's running jobs and takes over those whose owner
+        # has gone quiet, or queued jobs nobody has started within a lease.
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await database.write(lambda conn: _renew(conn, self.owner))
+                self._enqueue(await database.write(lambda conn: _recover(conn, JOB_LEASE_SECONDS)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error renewing job leases: {e}")
+
+    async def submit(self, user_id: Optional[int], conversation_id: Optional[int], intent: str, message: str, image: Optional[str]) -> str:
+        if self._queue is None or self._queue.qsize() >= self.queue_limit:
+            self._rejected += 1
+            raise JobQueueFull(f"{self._queue.qsize() if self._queue else 0} jobs already queued")
+
+        # The input image goes to the blob store so the job can be rerun from the table alone.
+        image_blob = await asyncio.to_thread(blob_store.put_b64, image)
+        job_id = uuid.uuid4().hex
+        await database.write(
+            lambda conn: conn.execute(
+                "INSERT INTO jobs (id, user_id, conversation_id, intent, message, image_blob) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, conversation_id, intent, message, image_blob)
+            )
+        )
+        self._enqueue([job_id])
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await database.read(lambda conn: _select_job(conn, job_id))
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        # Returns the job once it is done or failed, or its current state after timeout.
+        # Subscribe before reading so a job finishing in between is not missed.
+        event = self._finished.setdefault(job_id, asyncio.Event())
+        job = await self.get(job_id)
+        if job is None or job["status"] in ("done", "failed"):
+            self._finished.pop(job_id, None)
+            return job
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return await self.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._pending.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error running job {job_id}: {e}")
+
+    async def _run(self, job_id: str):
+        job = await self.get(job_id)
+        if job is None or job["status"] != "queued":
+            return
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            await self._fail(job_id, f"gave up after {job['attempts']} interrupted attempts")
+            return
+        # Only one process gets to run a job; the others see it is no longer queued.
+        claimed = await database.write(
+            lambda conn: conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP "
+                "WHERE id = ? AND status = 'queued'", (self.owner, job_id)
+            ).rowcount
+        )
+        if not claimed:
+            return
+
+        self._running += 1
+        try:
+            response_text, model_used, image = await self._handler(job)
+            result_blob = await asyncio.to_thread(blob_store.put_b64, image)
+            await database.write(
+                lambda conn: conn.execute(
+                    "UPDATE jobs SET status = 'done', response = ?, model_used = ?, result_blob = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (response_text, model_used, result_blob, job_id)
+                )
+            )
+            self._completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            await self._fail(job_id, str(e))
+        finally:
+            self._running -= 1
+            self._notify(job_id)
+
+    async def _fail(self, job_id: str, error: str):
+        self._failed += 1
+        await database.write(
+            lambda conn: conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?", (error, job_id)
+            )
+        )
+        self._notify(job_id)
+
+    def _notify(self, job_id: str):
+        event = self._finished.pop(job_id, None)
+        if event:
+            event.set()
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+
+queue = JobQueue()
@@ -0,0 +1,161 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Minimal Prometheus-style metrics: counters, histograms and collector
+# callbacks rendered in the text exposition format on /api/metrics.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_metrics = []
+_collectors: list[tuple[str, Callable[[], dict]]] = []
+
+
+def _format_labels(names: tuple, values: tuple, extra: Optional[dict] = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, {'le': bound})} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, {'le': '+Inf'})} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+def register_collector(prefix: str, fn: Callable[[], dict]):
+    # fn returns a flat dict of numbers (e.g. a subsystem's stats()); each
+    # key is exported as the gauge askgpt_<prefix>_<key>.
+    _collectors.append((prefix, fn))
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for prefix, fn in _collectors:
+        try:
+            values = fn()
+        except Exception as e:
+            print(f"Error collecting {prefix} metrics: {e}")
+            continue
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value):
+                continue
+            name = f"askgpt_{prefix}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Application Metrics ---
+STAGE_SECONDS = Histogram("askgpt_stage_seconds", "Time spent in each chat pipeline stage", ("stage", "intent"))
+CHAT_SECONDS = Histogram("askgpt_chat_seconds", "End-to-end chat latency", ("intent", "model"))
+UPSTREAM_SECONDS = Histogram("askgpt_upstream_seconds", "Upstream API call latency", ("endpoint", "model"))
+UPSTREAM_ERRORS = Counter("askgpt_upstream_errors_total", "Failed upstream API calls", ("endpoint", "model"))
+IMAGE_JOB_SECONDS = Histogram("askgpt_image_job_seconds", "Image engine job latency, queueing included", ("job",))
+FALLBACKS = Counter("askgpt_fallbacks_total", "Degraded paths taken instead of the normal one", ("kind",))
+MODEL_RETRIES = Counter("askgpt_model_retries_total", "Completion attempts retried after a transient failure", ("model",))
+HEDGED_REQUESTS = Counter("askgpt_hedged_requests_total", "Completions raced against the secondary model, by winner", ("intent", "winner"))
+SPECULATIONS = Counter("askgpt_speculative_completions_total", "Completions started before classification finished", ("outcome",))
+
+
+class ChatTrace:
+    # Collects stage timings for one chat request. Stages run before the
+    # intent is known, so everything is recorded under the final intent in
+    # finish(), which also writes one structured log line.
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - start
+
+    async def timed(self, stage: str, awaitable):
+        # span() for an awaitable that runs as its own task.
+        with self.span(stage):
+            return await awaitable
+
+    def finish(self, intent: str, model: str):
+        total = time.perf_counter() - self.started
+        for stage, seconds in self.stages.items():
+            STAGE_SECONDS.observe(seconds, stage=stage, intent=intent)
+        CHAT_SECONDS.observe(total, intent=intent, model=model)
+        print(json.dumps({
+            "event": "chat",
+            "endpoint": self.endpoint,
+            "intent": intent,
+            "model": model,
+            "total_ms": round(total * 1000, 1),
+            "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()},
+        }))
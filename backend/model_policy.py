@@ -0,0 +1,125 @@
+import asyncio
+import os
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+
+import metrics
+
+# Per-intent model policy for completions: an overall deadline, retries with
+# jittered exponential backoff on transient failures, a secondary model to
+# fall back to, and optionally a hedged request to that secondary model once
+# the primary runs past its own recent p95 latency.
+
+# --- Configuration ---
+MODEL_RETRIES = int(os.getenv("MODEL_RETRIES", "2"))
+MODEL_BACKOFF_BASE = float(os.getenv("MODEL_BACKOFF_BASE", "0.5"))
+MODEL_BACKOFF_CAP = float(os.getenv("MODEL_BACKOFF_CAP", "4"))
+MODEL_HEDGING = os.getenv("MODEL_HEDGING", "true").lower() in ("1", "true", "yes")
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1"))
+
+# (model, max_tokens, display name), like main.COMPLETION_ROUTES
+Route = tuple[str, int, str]
+
+
+@dataclass
+class Policy:
+    routes: list[Route]  # primary first, then the fallback
+    deadline: float  # seconds for the whole call, retries and hedge included
+    retries: int = MODEL_RETRIES
+    hedge: bool = MODEL_HEDGING
+    name: str = field(default="")
+
+
+_latencies: dict[str, deque] = {}
+
+
+def observe(model: str, seconds: float):
+    # Successful upstream latencies, the basis for the hedge delay.
+    _latencies.setdefault(model, deque(maxlen=200)).append(seconds)
+
+
+def p95(model: str):
+    samples = _latencies.get(model)
+    if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in (408, 409, 429) or e.response.status_code >= 500
+    return False
+
+
+async def _with_retries(route: Route, call: Callable[[Route], Awaitable], deadline: float, retries: int):
+    loop = asyncio.get_running_loop()
+    model = route[0]
+    for attempt in range(retries + 1):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError(f"{model}: deadline exceeded")
+        try:
+            return await asyncio.wait_for(call(route), remaining)
+        except Exception as e:
+            # Full jitter, so clients retrying the same outage spread out.
+            backoff = random.uniform(0, min(MODEL_BACKOFF_CAP, MODEL_BACKOFF_BASE * 2 ** attempt))
+            if attempt == retries or not is_retryable(e) or loop.time() + backoff >= deadline:
+                raise
+            print(f"Retrying {model} in {backoff:.2f}s after: {e!r}")
+            metrics.MODEL_RETRIES.inc(model=model)
+            await asyncio.sleep(backoff)
+
+
+async def run(policy: Policy, call: Callable[[Route], Awaitable]) -> tuple:
+    # Returns (result, route that produced it); raises the last error if every
+    # route failed or asyncio.TimeoutError once the deadline passes.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + policy.deadline
+    primary = policy.routes[0]
+    secondary = policy.routes[1] if len(policy.routes) > 1 else None
+
+    async def attempt(route: Route):
+        return await _with_retries(route, call, deadline, policy.retries), route
+
+    pending = {asyncio.ensure_future(attempt(primary))}
+    secondary_started = hedged = False
+    error = None
+    try:
+        hedge_after = p95(primary[0]) if policy.hedge and secondary else None
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(pending, timeout=max(HEDGE_MIN_DELAY, hedge_after))
+            if not done:
+                # Primary is slower than usual: race the secondary against it.
+                print(f"Hedging {policy.name}: {primary[0]} past its p95 of {hedge_after:.2f}s, starting {secondary[0]}")
+                pending.add(asyncio.ensure_future(attempt(secondary)))
+                secondary_started = hedged = True
+
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError(f"{policy.name}: deadline of {policy.deadline}s exceeded")
+            for task in done:
+                if task.exception() is None:
+                    result, route = task.result()
+                    if hedged:
+                        metrics.HEDGED_REQUESTS.inc(intent=policy.name, winner="primary" if route is primary else "secondary")
+                    return result, route
+                error = task.exception()
+            if not pending and secondary and not secondary_started:
+                # Primary failed for good: fall back to the secondary with what is left of the deadline.
+                print(f"Falling back to {secondary[0]} for {policy.name} after: {error!r}")
+                metrics.FALLBACKS.inc(kind="secondary_model")
+                pending.add(asyncio.ensure_future(attempt(secondary)))
+                secondary_started = True
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,28 +1,66 @@
 
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import subprocess
 import shlex
 import re
+import json
+import threading
+from cachetools import LRUCache
 from openai import OpenAI
 from groq import Groq
 
-# Configuration (ideally from env)
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_EMAIL = os.getenv("SMTP_EMAIL", "")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+from personal_task import rules
+from personal_task.mailer import mailer
+
+# Configuration (ideally from env; SMTP settings live in personal_task/mailer.py)
+# Commands the rule parser is at least this sure about skip the LLM
+AUTOMATION_RULE_CONFIDENCE = float(os.getenv("AUTOMATION_RULE_CONFIDENCE", "0.75"))
+AUTOMATION_PARSE_CACHE_SIZE = int(os.getenv("AUTOMATION_PARSE_CACHE_SIZE", "1024"))
 
 class AutomationAgent:
     def __init__(self):
-        self.client = Groq()
+        self._client = None
+        self._parsed = LRUCache(maxsize=AUTOMATION_PARSE_CACHE_SIZE)
+        self._lock = threading.Lock()
+        self.rule_hits = 0
+        self.cache_hits = 0
+        self.llm_calls = 0
+
+    @property
+    def client(self):
+        # Only commands the rules can't handle need Groq.
+        if self._client is None:
+            self._client = Groq()
+        return self._client
 
     def parse_command(self, user_command: str) -> dict:
+        """
+        Parses natural language into a structured command: rules first, LLM
+        only for what they can't handle confidently. Results are cached by the
+        whitespace-normalized command.
+        """
+        key = " ".join(user_command.split())
+        with self._lock:
+            cached = self._parsed.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+
+        parsed, confidence = rules.parse(key)
+        if confidence >= AUTOMATION_RULE_CONFIDENCE:
+            self.rule_hits += 1
+        else:
+            parsed = self.parse_command_llm(user_command)
+        if parsed.get("intent") not in (None, "UNKNOWN"):
+            with self._lock:
+                self._parsed[key] = parsed
+        return parsed
+
+    def parse_command_llm(self, user_command: str) -> dict:
         """
         Uses LLM to parse natural language into structured command.
         """
+        self.llm_calls += 1
         system_prompt = """
         You are an intelligent automation parser. 
         Extract the INTENT and PARAMETERS from the user's request.
@@ -50,13 +88,12 @@ class AutomationAgent:
                 response_format={"type": "json_object"}
             )
             content = response.choices[0].message.content
-            import json
             return json.loads(content)
         except Exception as e:
             print(f"Error parsing command: {e}")
             return {"intent": "UNKNOWN", "error": str(e)}
 
-    def execute(self, user_command: str) -> str:
+    def execute(self, user_command: str, user_id=None) -> str:
         parsed = self.parse_command(user_command)
         intent = parsed.get("intent")
         params = parsed.get("params", {})
@@ -65,7 +102,8 @@ class AutomationAgent:
             return self.send_email(
                 params.get("to_email"),
                 params.get("subject", "No Subject"),
-                params.get("body", "")
+                params.get("body", ""),
+                user_id
             )
         elif intent == "OPEN_APP":
             return self.open_app(params.get("app_name"))
@@ -74,36 +112,19 @@ class AutomationAgent:
         else:
             return "Sorry, I couldn't understand the automation verification."
 
-    def send_email(self, to_email, subject, body):
-        if not SMTP_EMAIL or not SMTP_PASSWORD:
+    def send_email(self, to_email, subject, body, user_id=None):
+        if not mailer.configured():
             return "Error: SMTP credentials not configured in backend/.env"
+        if not to_email:
+            return "Failed to send email: no recipient address."
 
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = SMTP_EMAIL
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
-
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            server.starttls()
-            server.login(SMTP_EMAIL, SMTP_PASSWORD)
-            text = msg.as_string()
-            server.sendmail(SMTP_EMAIL, to_email, text)
-            server.quit()
-            return f"Email sent successfully to {to_email}."
-        except Exception as e:
-            return f"Failed to send email: {str(e)}"
+        # Delivery happens in the background; the status is at /api/deliveries/{id}.
+        delivery_id = mailer.submit(to_email, subject, body, user_id)
+        return f"Email to {to_email} queued for delivery (delivery id: {delivery_id})."
 
     def open_app(self, app_name):
         # Map friendly names to actual commands
-        app_map = {
-            "vs code": "code",
-            "vscode": "code",
-            "chrome": "google-chrome",
-            "calculator": "gnome-calculator"
-        }
-        cmd = app_map.get(app_name.lower(), app_name)
+        cmd = rules.KNOWN_APPS.get(app_name.lower(), app_name)
         
         try:
             subprocess.Popen([cmd])
@@ -0,0 +1,228 @@
+import heapq
+import itertools
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Optional
+
+from cachetools import LRUCache
+
+# Outbound mail for the automation agent. send_email only queues the message
+# and returns a delivery id; one sender thread keeps an authenticated SMTP
+# connection open between sends, retries transient failures with backoff and
+# records each delivery's status for /api/deliveries/{id}. Point SMTP_SERVER
+# at a local stand-in (e.g. `python -m aiosmtpd -n -l localhost:1025`) with
+# SMTP_STARTTLS=false and no SMTP_PASSWORD to try it without a real account.
+
+# --- Configuration ---
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_EMAIL = os.getenv("SMTP_EMAIL", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))  # close the connection after this long unused
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_BACKOFF_BASE = float(os.getenv("MAIL_BACKOFF_BASE", "2"))
+MAIL_BACKOFF_CAP = float(os.getenv("MAIL_BACKOFF_CAP", "300"))
+MAIL_STATUS_LIMIT = int(os.getenv("MAIL_STATUS_LIMIT", "10000"))  # deliveries remembered for status queries
+
+
+def is_retryable(e: Exception) -> bool:
+    # 4xx replies and dropped connections are worth another try; 5xx and bad credentials are not.
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in e.recipients.values())
+    if isinstance(e, smtplib.SMTPResponseException):
+        return 400 <= e.smtp_code < 500
+    return isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+
+class Mailer:
+    def __init__(self):
+        self._deliveries = LRUCache(maxsize=MAIL_STATUS_LIMIT)
+        self._messages: dict[str, MIMEMultipart] = {}
+        self._schedule: list = []  # (not before, seq, delivery id)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._conn: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections = 0
+
+    def configured(self) -> bool:
+        return bool(SMTP_EMAIL)
+
+    def submit(self, to_email: str, subject: str, body: str, user_id: Optional[int] = None) -> str:
+        msg = MIMEMultipart()
+        msg['From'] = SMTP_EMAIL
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+
+        delivery_id = uuid.uuid4().hex
+        now = time.time()
+        with self._cond:
+            self._deliveries[delivery_id] = {
+                "delivery_id": delivery_id,
+                "user_id": user_id,  # only this user may read the status
+                "to_email": to_email,
+                "subject": subject,
+                "status": "queued",  # queued, sent or failed
+                "attempts": 0,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            self._messages[delivery_id] = msg
+            heapq.heappush(self._schedule, (time.monotonic(), next(self._seq), delivery_id))
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="mailer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return delivery_id
+
+    def get(self, delivery_id: str) -> Optional[dict]:
+        with self._cond:
+            delivery = self._deliveries.get(delivery_id)
+            return dict(delivery) if delivery else None
+
+    def stop(self, timeout: float = 5):
+        # Deliveries still queued at shutdown are not sent.
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread, self._thread = self._thread, None
+        if thread:
+            thread.join(timeout)
+
+    def _update(self, delivery_id: str, **fields):
+        with self._cond:
+            delivery = self._deliveries.get(delivery_id)
+            if delivery:
+                delivery.update(fields, updated_at=time.time())
+
+    def _next(self) -> Optional[str]:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    now = time.monotonic()
+                    if self._schedule and self._schedule[0][0] <= now:
+                        return heapq.heappop(self._schedule)[2]
+                    if self._conn is not None and now - self._last_used >= SMTP_IDLE_TIMEOUT:
+                        break
+                    wait = self._schedule[0][0] - now if self._schedule else None
+                    if self._conn is not None:
+                        idle_left = self._last_used + SMTP_IDLE_TIMEOUT - now
+                        wait = idle_left if wait is None else min(wait, idle_left)
+                    self._cond.wait(wait)
+                else:
+                    return None
+            # Idle too long: QUIT is network I/O, so it happens outside the lock
+            # that get() (and with it /api/deliveries) takes.
+            self._close()
+
+    def _run(self):
+        try:
+            while True:
+                delivery_id = self._next()
+                if delivery_id is None:
+                    return
+                self._deliver(delivery_id)
+        finally:
+            self._close()
+
+    def _deliver(self, delivery_id: str):
+        msg = self._messages.get(delivery_id)
+        delivery = self.get(delivery_id)
+        if msg is None or delivery is None:
+            self._messages.pop(delivery_id, None)
+            return
+        attempts = delivery["attempts"] + 1
+        try:
+            self._send(msg)
+        except Exception as e:
+            if attempts < MAIL_MAX_ATTEMPTS and is_retryable(e):
+                backoff = random.uniform(0, min(MAIL_BACKOFF_CAP, MAIL_BACKOFF_BASE * 2 ** attempts))
+                print(f"Retrying delivery {delivery_id} in {backoff:.1f}s after: {e!r}")
+                self.retried += 1
+                self._update(delivery_id, attempts=attempts, error=str(e))
+                with self._cond:
+                    heapq.heappush(self._schedule, (time.monotonic() + backoff, next(self._seq), delivery_id))
+                return
+            print(f"Delivery {delivery_id} failed: {e!r}")
+            self.failed += 1
+            self._messages.pop(delivery_id, None)
+            self._update(delivery_id, status="failed", attempts=attempts, error=str(e))
+            return
+        self.sent += 1
+        self._messages.pop(delivery_id, None)
+        self._update(delivery_id, status="sent", attempts=attempts, error=None)
+
+    def _send(self, msg: MIMEMultipart):
+        for retry in (False, True):
+            reused = self._conn is not None
+            try:
+                self._connection().sendmail(SMTP_EMAIL, msg['To'], msg.as_string())
+                return
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped the idle connection; one fresh try before counting an attempt.
+                self._close()
+                if retry or not reused:
+                    raise
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # The connection is still good for the next message.
+                raise
+            except Exception:
+                self._close()
+                raise
+            finally:
+                self._last_used = time.monotonic()
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._conn is None:
+            conn = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+            try:
+                if SMTP_STARTTLS:
+                    conn.starttls()
+                if SMTP_PASSWORD:
+                    conn.login(SMTP_EMAIL, SMTP_PASSWORD)
+            except Exception:
+                conn.close()
+                raise
+            self._conn = conn
+            self.connections += 1
+        return self._conn
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._schedule),
+            "connected": self._conn is not None,
+            "connections": self.connections,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+mailer = Mailer()
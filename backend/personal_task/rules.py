@@ -0,0 +1,99 @@
+import re
+
+# Deterministic parser for the common automation commands. Returns the same
+# {"intent", "params"} shape as the LLM parser plus a confidence in [0, 1];
+# AutomationAgent only asks the LLM when the confidence is too low.
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+EMAIL_TRIGGER_RE = re.compile(r"\b(?:e-?mail|mail|send)\b", re.IGNORECASE)
+SUBJECT_RE = re.compile(
+    r"\b(?:with (?:the )?subject|subject(?: line)?|titled)\s*[:\-]?\s*[\"']?(?P<subject>.+?)[\"']?"
+    r"(?=\s*(?:,|\band\b|\bsaying\b|\bthat says\b|\bbody\b|\bmessage\b)|$)",
+    re.IGNORECASE,
+)
+BODY_RE = re.compile(
+    r"\b(?:saying|that says|which says|to say|telling (?:them|him|her)|with (?:the )?(?:body|message)|body|message)\s*[:\-]?\s*"
+    r"[\"']?(?P<body>.+?)[\"']?[.!]?$",
+    re.IGNORECASE,
+)
+
+OPEN_RE = re.compile(
+    r"^(?:please\s+|can you\s+|could you\s+)?(?:open|launch|start|run)\s+(?:up\s+)?(?:the\s+|my\s+)?(?P<target>.+?)[.!?]?$",
+    re.IGNORECASE,
+)
+WITH_APP_RE = re.compile(r"^(?P<target>.+?)\s+(?:with|in|using)\s+(?P<app>[\w .+-]+?)$", re.IGNORECASE)
+FILE_HINT_RE = re.compile(r"(?:^[~/.]|[\\/]|\.[A-Za-z0-9]{1,5}$)")
+APP_SUFFIX_RE = re.compile(r"\s+(?:app|application|program)$", re.IGNORECASE)
+APP_PREFIX_RE = re.compile(r"^(?:app|application|program)\s+", re.IGNORECASE)
+FILE_PREFIX_RE = re.compile(r"^(?:the\s+)?(?:file|document)\s+", re.IGNORECASE)
+
+# Friendly app names -> the command AutomationAgent.open_app runs for them
+KNOWN_APPS = {
+    "vs code": "code", "vscode": "code", "code": "code", "visual studio code": "code",
+    "chrome": "google-chrome", "google chrome": "google-chrome", "firefox": "firefox",
+    "calculator": "gnome-calculator", "terminal": "gnome-terminal", "spotify": "spotify", "slack": "slack",
+    "files": "nautilus", "nautilus": "nautilus", "gedit": "gedit", "text editor": "gedit",
+}
+
+
+def _subject_from_body(body: str) -> str:
+    first = re.split(r"(?<=[.!?])\s", body, maxsplit=1)[0].strip()
+    return first if len(first) <= 50 else first[:47].rstrip() + "..."
+
+
+def parse_email(command: str):
+    emails = EMAIL_RE.findall(command)
+    if len(emails) != 1 or not EMAIL_TRIGGER_RE.search(command):
+        return None
+    to_email = emails[0]
+    # Look for subject/body only after the address, so "mail to x@y.com" is not mistaken for a body.
+    rest = command[command.index(to_email) + len(to_email):].strip(" ,:")
+
+    body_match = BODY_RE.search(rest)
+    body = body_match.group("body").strip() if body_match else ""
+    subject_match = SUBJECT_RE.search(rest[:body_match.start()] if body_match else rest)
+    subject = subject_match.group("subject").strip() if subject_match else ""
+
+    params = {"to_email": to_email, "subject": subject or (_subject_from_body(body) if body else "No Subject"), "body": body}
+    # Without a body the LLM should write one.
+    return {"intent": "SEND_EMAIL", "params": params}, 0.95 if body else 0.5
+
+
+def parse_open(command: str):
+    match = OPEN_RE.match(command)
+    if not match:
+        return None
+    target = match.group("target").strip()
+
+    app_name = None
+    with_app = WITH_APP_RE.match(target)
+    if with_app and FILE_HINT_RE.search(with_app.group("target")):
+        target, app_name = with_app.group("target").strip(), with_app.group("app").strip()
+
+    file_target = FILE_PREFIX_RE.sub("", target)
+    if FILE_PREFIX_RE.match(target) or FILE_HINT_RE.search(file_target):
+        params = {"file_path": file_target.strip("\"'")}
+        if app_name:
+            params["app_name"] = app_name
+        return {"intent": "OPEN_FILE", "params": params}, 0.9
+
+    app = APP_PREFIX_RE.sub("", APP_SUFFIX_RE.sub("", target)).strip("\"'")
+    if app.lower() in KNOWN_APPS:
+        confidence = 0.95
+    elif len(app.split()) == 1:
+        # Could be an app or a file ("launch my resume"); the LLM decides
+        confidence = 0.5
+    else:
+        # "open the thing I was working on yesterday" needs the LLM
+        confidence = 0.4
+    return {"intent": "OPEN_APP", "params": {"app_name": app}}, confidence
+
+
+def parse(command: str) -> tuple[dict, float]:
+    command = " ".join(command.split())
+    best = ({"intent": "UNKNOWN", "params": {}}, 0.0)
+    for parser in (parse_email, parse_open):
+        result = parser(command)
+        if result and result[1] > best[1]:
+            best = result
+    return best
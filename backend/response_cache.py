@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# --- Configuration ---
+RESPONSE_CACHE_INTENTS = {i.strip() for i in os.getenv("RESPONSE_CACHE_INTENTS", "image_generation,image_manipulation,casual_chat").split(",") if i.strip()}
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Optional second tier that survives restarts and is shared by workers; empty disables it.
+RESPONSE_CACHE_DISK_PATH = os.getenv("RESPONSE_CACHE_DISK_PATH", "")
+RESPONSE_CACHE_DISK_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_DISK_MAX_ENTRIES", "10000"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def make_key(*parts) -> str:
+    encoded = json.dumps(_normalize(list(parts)), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def completion_key(model: str, messages: list, max_tokens: int) -> str:
+    return make_key("completion", model, messages, max_tokens)
+
+
+def image_key(model: str, prompt: str) -> str:
+    # Image prompts are matched case-insensitively.
+    return make_key("image", model, prompt.lower())
+
+
+# --- In-Memory Tier ---
+class MemoryTier:
+    # LRU bounded by entry count and total value size, with a per-entry TTL.
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# --- On-Disk Tier ---
+class DiskTier:
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+        self._conn.commit()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at < ? DESC, accessed_at ASC LIMIT ?)",
+                    (now, excess),
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Two-Tier Cache ---
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 ttl: float = RESPONSE_CACHE_TTL, disk_path: str = RESPONSE_CACHE_DISK_PATH,
+                 disk_max_entries: int = RESPONSE_CACHE_DISK_MAX_ENTRIES):
+        self.memory = MemoryTier(max_entries, max_bytes, ttl)
+        self.disk = DiskTier(disk_path, disk_max_entries, ttl) if disk_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "memory_entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+            "disk_evictions": self.disk.evictions if self.disk is not None else 0,
+        }
+
+
+cache = ResponseCache()
+
+
+def is_cached_intent(intent: str) -> bool:
+    return intent in RESPONSE_CACHE_INTENTS
@@ -0,0 +1,67 @@
+import os
+import re
+import sqlite3
+from typing import Optional
+
+# Full-text search over a user's conversation history, backed by the FTS5
+# tables from migration 8 (messages_fts, conversations_fts). Every query is
+# ANDed with the user's owner token, so SQLite only walks that user's
+# postings instead of filtering everyone's matches afterwards.
+
+# --- Configuration ---
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "16"))
+SNIPPET_START, SNIPPET_END = "<mark>", "</mark>"
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(column: str, user_id: int, text: str) -> Optional[str]:
+    # User input is reduced to plain terms, each quoted, so FTS5 operators and
+    # column filters in it are searched for literally instead of parsed. The
+    # last term matches as a prefix for search-as-you-type, once it is long
+    # enough to hit the prefix index.
+    terms = TERM_RE.findall(text)
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= 2:
+        phrases[-1] += "*"
+    return f"owner:u{user_id} AND {column}:({' '.join(phrases)})"
+
+
+def search_messages(conn: sqlite3.Connection, user_id: int, text: str, limit: int = SEARCH_PAGE_SIZE, conversation_id: Optional[int] = None) -> list:
+    expression = match_expression("content", user_id, text)
+    if expression is None:
+        return []
+    query = f"""
+        SELECT m.id, m.conversation_id, c.title AS conversation_title, m.role, m.timestamp,
+               snippet(messages_fts, 0, ?, ?, '…', ?) AS snippet
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        LEFT JOIN conversations c ON c.id = m.conversation_id
+        WHERE messages_fts MATCH ? {"AND m.conversation_id = ?" if conversation_id is not None else ""}
+        ORDER BY messages_fts.rank
+        LIMIT ?
+    """
+    params = [SNIPPET_START, SNIPPET_END, SEARCH_SNIPPET_TOKENS, expression]
+    if conversation_id is not None:
+        params.append(conversation_id)
+    params.append(limit)
+    return [dict(row) for row in conn.execute(query, params)]
+
+
+def search_conversations(conn: sqlite3.Connection, user_id: int, text: str, limit: int = SEARCH_PAGE_SIZE) -> list:
+    expression = match_expression("title", user_id, text)
+    if expression is None:
+        return []
+    query = """
+        SELECT c.id, c.title, c.updated_at,
+               highlight(conversations_fts, 0, ?, ?) AS snippet
+        FROM conversations_fts
+        JOIN conversations c ON c.id = conversations_fts.rowid
+        WHERE conversations_fts MATCH ?
+        ORDER BY conversations_fts.rank
+        LIMIT ?
+    """
+    return [dict(row) for row in conn.execute(query, (SNIPPET_START, SNIPPET_END, expression, limit))]
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Awaitable, Callable
+
+
+class SingleFlight:
+    # Coalesces concurrent calls that share a key: the first caller starts the
+    # work, later callers with the same key await that same task instead of
+    # issuing their own upstream request. Nothing is cached once it finishes.
+    # The shared task outlives any one caller, but once every caller waiting
+    # on it has gone (timed out, hedge lost, client disconnected) it is
+    # cancelled, so abandoned upstream requests do not hold their slot.
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # Run as its own task so a disconnecting first caller does not
+            # cancel the request everyone else is waiting on.
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Last waiter left: later callers start afresh instead of joining a dying task.
+                    self.abandoned += 1
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "upstream_calls": self.calls,
+            "calls_saved": self.coalesced,
+            "in_flight": len(self._inflight),
+            "abandoned": self.abandoned,
+        }
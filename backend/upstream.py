@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+import httpx
+
+import metrics
+
+# --- Configuration ---
+EURON_BASE_URL = os.getenv("EURON_BASE_URL", "https://api.euron.one/api/v1/euri")
+EURON_API_KEY = os.getenv("EURON_API_KEY", "euri-e5140be39e9cc1c88bd8091d12e724e4338034ccafb7697d677bc1d1683e9c0a")
+
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "120"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "64"))
+
+# --- Shared Client ---
+# One AsyncClient per process so TLS connections are kept alive and reused
+# across requests. The semaphore caps in-flight upstream calls so a burst of
+# chats queues here instead of exhausting the pool or the provider quota.
+_client: Optional[httpx.AsyncClient] = None
+_semaphore = asyncio.Semaphore(UPSTREAM_MAX_CONCURRENCY)
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(UPSTREAM_READ_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _auth_headers() -> dict:
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {EURON_API_KEY}",
+    }
+
+
+async def post_json(path: str, payload: dict) -> dict:
+    model = payload.get("model", "")
+    async with _semaphore:
+        try:
+            with metrics.UPSTREAM_SECONDS.time(endpoint=path, model=model):
+                response = await get_client().post(f"{EURON_BASE_URL}{path}", headers=_auth_headers(), json=payload)
+                response.raise_for_status()
+                return response.json()
+        except Exception:
+            metrics.UPSTREAM_ERRORS.inc(endpoint=path, model=model)
+            raise
+
+
+async def fetch_bytes(url: str) -> bytes:
+    # Used for provider-hosted result URLs, so no Euron credentials are sent.
+    async with _semaphore:
+        try:
+            with metrics.UPSTREAM_SECONDS.time(endpoint="image_download", model=""):
+                response = await get_client().get(url)
+                response.raise_for_status()
+                return response.content
+        except Exception:
+            metrics.UPSTREAM_ERRORS.inc(endpoint="image_download", model="")
+            raise
+
+
+async def stream_json(path: str, payload: dict):
+    # Yields decoded chunks from an OpenAI-style "data: {...}" event stream.
+    endpoint, model = f"{path} (stream)", payload.get("model", "")
+    async with _semaphore:
+        try:
+            with metrics.UPSTREAM_SECONDS.time(endpoint=endpoint, model=model):
+                async with get_client().stream("POST", f"{EURON_BASE_URL}{path}", headers=_auth_headers(), json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        yield json.loads(data)
+        except Exception:
+            metrics.UPSTREAM_ERRORS.inc(endpoint=endpoint, model=model)
+            raise
@@ -1,4 +1,4 @@
-import React, { useState, useRef, useEffect } from 'react';
+import React, { useState, useRef, useEffect, useLayoutEffect } from 'react';
 import { Send, Image, Paperclip, Mic, Plus, MessageSquare, Settings, LogOut, Bot, Code, Sparkles, Loader2, Trash2 } from 'lucide-react';
 import { useTheme } from '../context/ThemeContext';
 import { useAuth } from '../context/AuthContext';
@@ -16,6 +16,14 @@ const ChatInterface = () => {
         { id: 1, text: "Hello! I'm AskGPT. How can I help you today?", sender: 'ai', model: 'GPT-4o' },
     ]);
     const [conversations, setConversations] = useState([]);
+    // X-Next-Cursor of the last page loaded; null once everything is shown
+    const [conversationsCursor, setConversationsCursor] = useState(null);
+    const [historyCursor, setHistoryCursor] = useState(null);
+    const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+    const messagesContainerRef = useRef(null);
+    // Scroll height before older messages were prepended, to keep the view in place
+    const prependScrollRef = useRef(null);
+    const lastScrollTopRef = useRef(0);
     const [currentConversationId, setCurrentConversationId] = useState(null);
     const [input, setInput] = useState("");
     const [isLoading, setIsLoading] = useState(false);
@@ -24,17 +32,21 @@ const ChatInterface = () => {
 
     const [showSettings, setShowSettings] = useState(false);
 
-    // Fetch Conversations list
-    const fetchConversations = async () => {
+    // Fetch Conversations list (first page, or the next one when given a cursor)
+    const fetchConversations = async (cursor = null) => {
         const token = localStorage.getItem('token');
         if (!token) return;
         try {
-            const response = await fetch('http://localhost:8000/api/conversations', {
+            const url = cursor
+                ? `http://localhost:8000/api/conversations?cursor=${encodeURIComponent(cursor)}`
+                : 'http://localhost:8000/api/conversations';
+            const response = await fetch(url, {
                 headers: { 'Authorization': `Bearer ${token}` }
             });
             if (response.ok) {
                 const data = await response.json();
-                setConversations(data);
+                setConversations(prev => cursor ? [...prev, ...data] : data);
+                setConversationsCursor(response.headers.get('X-Next-Cursor'));
             }
         } catch (error) {
             console.error("Failed to load conversations:", error);
@@ -47,6 +59,7 @@ const ChatInterface = () => {
 
     const handleNewChat = () => {
         setCurrentConversationId(null);
+        setHistoryCursor(null);
         setMessages([
             { id: Date.now(), text: "Hello! I'm AskGPT. How can I help you today?", sender: 'ai', model: 'GPT-4o' },
         ]);
@@ -74,42 +87,70 @@ const ChatInterface = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
     };
 
+    // History comes newest page first; each older page is prepended.
+    const fetchHistory = async (conversationId, cursor = null) => {
+        const token = localStorage.getItem('token');
+        if (!token) return;
+
+        let url = `http://localhost:8000/api/history?conversation_id=${conversationId}`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+        const response = await fetch(url, {
+            headers: { 'Authorization': `Bearer ${token}` }
+        });
+
+        if (response.status === 401) {
+            logout();
+            navigate('/');
+            return;
+        }
+
+        if (response.ok) {
+            const data = await response.json();
+            if (cursor) {
+                prependScrollRef.current = messagesContainerRef.current?.scrollHeight ?? null;
+                setMessages(prev => [...data, ...prev]);
+            } else {
+                setMessages(data); // Empty if new
+            }
+            setHistoryCursor(response.headers.get('X-Next-Cursor'));
+        }
+    };
+
     // Load History when conversation changes
     useEffect(() => {
-        const fetchHistory = async () => {
-            const token = localStorage.getItem('token');
-            if (!token) return;
-
-            // If New Chat (null ID), don't fetch history, just keep welcome msg
-            if (!currentConversationId) return;
-
-            try {
-                const response = await fetch(`http://localhost:8000/api/history?conversation_id=${currentConversationId}`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                });
-
-                if (response.status === 401) {
-                    logout();
-                    navigate('/');
-                    return;
-                }
-
-                if (response.ok) {
-                    const data = await response.json();
-                    if (data.length > 0) {
-                        setMessages(data);
-                    } else {
-                        setMessages([]); // Empty if new
-                    }
-                }
-            } catch (error) {
-                console.error("Failed to load history:", error);
-            }
-        };
-        fetchHistory();
+        // If New Chat (null ID), don't fetch history, just keep welcome msg
+        if (!currentConversationId) return;
+        setHistoryCursor(null);
+        fetchHistory(currentConversationId).catch(error => console.error("Failed to load history:", error));
     }, [currentConversationId]);
 
-    useEffect(() => {
+    const loadOlderMessages = async () => {
+        if (!historyCursor || isLoadingOlder || !currentConversationId) return;
+        setIsLoadingOlder(true);
+        try {
+            await fetchHistory(currentConversationId, historyCursor);
+        } catch (error) {
+            console.error("Failed to load older messages:", error);
+        } finally {
+            setIsLoadingOlder(false);
+        }
+    };
+
+    const handleMessagesScroll = (e) => {
+        // Only when the user scrolls up, not while scrolling down to the newest message.
+        const { scrollTop } = e.currentTarget;
+        if (scrollTop < lastScrollTopRef.current && scrollTop < 80) loadOlderMessages();
+        lastScrollTopRef.current = scrollTop;
+    };
+
+    useLayoutEffect(() => {
+        const container = messagesContainerRef.current;
+        if (prependScrollRef.current !== null && container) {
+            // Older messages were added above: keep what the user was reading in place.
+            container.scrollTop += container.scrollHeight - prependScrollRef.current;
+            prependScrollRef.current = null;
+            return;
+        }
         scrollToBottom();
     }, [messages, isLoading]);
 
@@ -266,6 +307,14 @@ const ChatInterface = () => {
                     {conversations.length === 0 && (
                         <div className="text-sm text-gray-600 px-3">No chats yet.</div>
                     )}
+                    {conversationsCursor && (
+                        <button
+                            onClick={() => fetchConversations(conversationsCursor)}
+                            className="w-full text-left px-3 py-2 rounded-lg hover:bg-gray-800 transition-colors text-sm text-gray-400"
+                        >
+                            Load more
+                        </button>
+                    )}
                 </div>
 
                 <div className="p-4 border-t border-gray-800">
@@ -294,7 +343,19 @@ const ChatInterface = () => {
                 </header>
 
                 {/* Messages */}
-                <div className="flex-1 overflow-y-auto p-6 space-y-6">
+                <div ref={messagesContainerRef} onScroll={handleMessagesScroll} className="flex-1 overflow-y-auto p-6 space-y-6">
+                    {historyCursor && (
+                        <div className="flex justify-center">
+                            <button
+                                onClick={loadOlderMessages}
+                                disabled={isLoadingOlder}
+                                className="flex items-center gap-2 px-3 py-1 rounded-full text-xs text-gray-500 dark:text-gray-400 hover:bg-gray-100 dark:hover:bg-gray-800 transition-colors"
+                            >
+                                {isLoadingOlder && <Loader2 className="h-3 w-3 animate-spin" />}
+                                Load older messages
+                            </button>
+                        </div>
+                    )}
                     {messages.map((msg) => (
                         <div key={msg.id} className={`flex ${msg.sender === 'user' ? 'justify-end' : 'justify-start'}`}>
                             <div className={`flex max-w-3xl gap-4 ${msg.sender === 'user' ? 'flex-row-reverse' : 'flex-row'}`}>
@@ -321,9 +382,9 @@ const ChatInterface = () => {
                                                 {msg.text}
                                             </ReactMarkdown>
                                         </div>
-                                        {msg.image && (
+                                        {(msg.image || msg.image_url) && (
                                             <div className="mt-3 rounded-lg overflow-hidden border border-gray-100 dark:border-gray-700">
-                                                <img src={`data:image/png;base64,${msg.image}`} alt="Generated content" className="w-full h-auto max-w-md" />
+                                                <img src={msg.image ? `data:image/png;base64,${msg.image}` : `http://localhost:8000${msg.image_url}`} alt="Generated content" loading="lazy" className="w-full h-auto max-w-md" />
                                             </div>
                                         )}
                                     </div>